@@ -1,11 +1,36 @@
+import functools
 import json
 import logging
+import numpy as np
+import os
 import pika
+import random
+import sys
 import time
+from collections import defaultdict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict, Any
 
-from config.settings import get_rabbitmq_config
-from app.services.optimizer import optimize_timetable
+try:
+    import orjson
+except ImportError:  # stdlib fallback for development installs
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # large messages are then fully decoded to read the pattern
+    ijson = None
+
+from config.settings import get_app_config, get_rabbitmq_config
+from app.services.optimizer import optimize_timetable, warmup
+from app.utils.jit import set_num_threads
+from app.utils.costs import (
+    check_hard_constraints,
+    empty_space_groups_cost,
+    empty_space_teachers_cost,
+)
 from app.models.timetable_data import TimetableData
 from app.models.class_allocation import ClassAllocation
 from app.models.class_group import ClassGroup
@@ -20,6 +45,93 @@ from app.models.schedule import Schedule
 
 logger = logging.getLogger(__name__)
 
+# Messages above this size are not fully decoded on the consumer's I/O thread
+LARGE_MESSAGE_BYTES = 4 * 1024 * 1024
+
+# Matrix rows are 5 days x 12 one-hour slots starting at 7am
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday')
+HOURS = tuple(range(7, 19))  # 7am-6pm
+
+
+def _json_default(obj):
+    """Serializes NumPy values for the stdlib json fallback"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def loads(body):
+    """Decodes a JSON message body (bytes or str)"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def peek_pattern(body):
+    """
+    Reads the command pattern of a message without keeping its payload.
+    
+    Bodies larger than LARGE_MESSAGE_BYTES are scanned with ijson, which only
+    builds the top-level "pattern" value and stops as soon as it has been read,
+    so the I/O thread never materializes a huge optimize_timetable payload that
+    the worker process decodes again anyway.
+    """
+    if ijson is not None and len(body) > LARGE_MESSAGE_BYTES:
+        try:
+            return next(ijson.items(body, "pattern"), None)
+        except ijson.JSONError as e:
+            raise json.JSONDecodeError(str(e), "", 0) from e
+    return loads(body).get("pattern")
+
+
+def dumps(obj) -> bytes:
+    """Encodes a reply as JSON bytes, including NumPy arrays and scalars"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_json_default).encode()
+
+
+# Constant replies are encoded once instead of on every message
+TEST_CONNECTION_BODY = dumps({"status": "success", "message": "Connection established"})
+
+
+@functools.lru_cache(maxsize=64)
+def unknown_command_body(command: str) -> bytes:
+    """Encoded error reply for an unknown command pattern"""
+    return dumps({"status": "error", "message": f"Unknown command: {command}"})
+
+
+def _intern(value):
+    """Interns string values; anything else (e.g. a null name) is returned as is"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _parse_duration(allocation: Dict[str, Any]) -> int:
+    """
+    Reads the duration of an allocation as an int.
+    
+    Durations may arrive as strings or floats ("2.0"); they are coerced once
+    here so the model and the int32 column agree.
+    
+    Args:
+        allocation: Class allocation entry of the message
+        
+    Returns:
+        Duration in time slots
+        
+    Raises:
+        ValueError: If the duration is not a whole number of time slots
+    """
+    value = allocation["duration"]
+    duration = float(value)
+    if not duration.is_integer():
+        raise ValueError(
+            f"Allocation {allocation.get('id')} has a non-integral duration: {value!r}"
+        )
+    return int(duration)
+
 
 def parse_timetable_data(data: Dict[str, Any]) -> TimetableData:
     """
@@ -49,17 +161,27 @@ def parse_timetable_data(data: Dict[str, Any]) -> TimetableData:
     Returns:
         Processed TimetableData
     """
+    # Low-cardinality names (weekdays, shifts, space and course types) are
+    # interned so repeated values share one string object
+    
     # Parse SpaceTypes
     space_types = {}
     for st in data.get("space_types", []):
         space_types[st["id"]] = SpaceType(
             id=st["id"],
-            name=st["name"]
+            name=_intern(st["name"])
         )
     
     # Parse Classrooms
     classrooms = {}
-    for room in data.get("classrooms", []):
+    rooms_data = data.get("classrooms", [])
+    classroom_index = {}
+    classroom_ids = np.empty(len(rooms_data), dtype=np.int32)
+    classroom_capacity = np.empty(len(rooms_data), dtype=np.int32)
+    classroom_floor = np.empty(len(rooms_data), dtype=np.int32)
+    classroom_space_type = np.empty(len(rooms_data), dtype=np.int32)
+    classroom_blocked = np.empty(len(rooms_data), dtype=np.bool_)
+    for i, room in enumerate(rooms_data):
         classrooms[room["id"]] = Classroom(
             id=room["id"],
             name=room["name"],
@@ -68,13 +190,28 @@ def parse_timetable_data(data: Dict[str, Any]) -> TimetableData:
             blocked=room.get("blocked", False),
             space_type=space_types[room["space_type_id"]]
         )
+        classroom_index[room["id"]] = i
+        classroom_ids[i] = room["id"]
+        classroom_capacity[i] = room["capacity"]
+        classroom_floor[i] = room["floor"]
+        classroom_space_type[i] = room["space_type_id"]
+        classroom_blocked[i] = room.get("blocked", False)
+    
+    # One bitmask of usable (not blocked) classroom columns per space_type, shared
+    # by every allocation requiring it. Python ints grow as needed, so there is
+    # no limit on the number of classrooms.
+    space_type_classroom_mask = {}
+    for i, room in enumerate(rooms_data):
+        if not room.get("blocked", False):
+            space_type_id = room["space_type_id"]
+            space_type_classroom_mask[space_type_id] = space_type_classroom_mask.get(space_type_id, 0) | (1 << i)
     
     # Parse CourseTypes
     course_types = {}
     for ct in data.get("course_types", []):
         course_types[ct["id"]] = CourseType(
             id=ct["id"],
-            name=ct["name"]
+            name=_intern(ct["name"])
         )
     
     # Parse Courses
@@ -91,18 +228,23 @@ def parse_timetable_data(data: Dict[str, Any]) -> TimetableData:
     for shift in data.get("shifts", []):
         shifts[shift["id"]] = Shift(
             id=shift["id"],
-            name=shift["name"]
+            name=_intern(shift["name"])
         )
     
     # Parse Schedules FIRST (needed by teachers)
     schedules = {}
-    for schedule in data.get("schedules", []):
+    schedules_data = data.get("schedules", [])
+    schedule_index = {}
+    schedule_ids = np.empty(len(schedules_data), dtype=np.int32)
+    for i, schedule in enumerate(schedules_data):
         schedules[schedule["id"]] = Schedule(
             id=schedule["id"],
-            weekday=schedule["weekday"],
+            weekday=_intern(schedule["weekday"]),
             start_time=schedule["start_time"],
             end_time=schedule["end_time"]
         )
+        schedule_index[schedule["id"]] = i
+        schedule_ids[i] = schedule["id"]
     
     # Parse Subjects (needs courses and space_types, but NOT teachers yet)
     subjects = {}
@@ -117,23 +259,27 @@ def parse_timetable_data(data: Dict[str, Any]) -> TimetableData:
     # Parse Teachers (needs schedules)
     teachers = {}
     teacher_schedules_map = data.get("teacher_schedules", {})
+    teachers_data = data.get("teachers", [])
+    teacher_index = {}
+    teacher_ids = np.empty(len(teachers_data), dtype=np.int32)
     
-    for teacher in data.get("teachers", []):
+    # Subjects of each teacher from class_allocations, built in a single pass
+    teacher_subjects_map = defaultdict(dict)  # teacher_id -> {subject_id: None}, insertion ordered
+    for allocation in data.get("class_allocations", []):
+        if allocation["subject_id"] in subjects:
+            teacher_subjects_map[allocation["teacher_id"]][allocation["subject_id"]] = None
+    
+    for i, teacher in enumerate(teachers_data):
         teacher_id = teacher["id"]
+        teacher_index[teacher_id] = i
+        teacher_ids[i] = teacher_id
         
         # Get schedules for this teacher
         teacher_schedule_ids = teacher_schedules_map.get(str(teacher_id), [])
         teacher_schedule_objs = [schedules[sid] for sid in teacher_schedule_ids if sid in schedules]
         
         # Get subjects for this teacher from class_allocations
-        teacher_subject_objs = []
-        teacher_subject_ids = set()
-        for allocation in data.get("class_allocations", []):
-            if allocation["teacher_id"] == teacher_id:
-                subject_id = allocation["subject_id"]
-                if subject_id not in teacher_subject_ids and subject_id in subjects:
-                    teacher_subject_ids.add(subject_id)
-                    teacher_subject_objs.append(subjects[subject_id])
+        teacher_subject_objs = [subjects[sid] for sid in teacher_subjects_map.get(teacher_id, ())]
         
         teachers[teacher_id] = Teacher(
             id=teacher_id,
@@ -144,7 +290,11 @@ def parse_timetable_data(data: Dict[str, Any]) -> TimetableData:
     
     # Parse ClassGroups
     class_groups = {}
-    for group in data.get("class_groups", []):
+    groups_data = data.get("class_groups", [])
+    class_group_index = {}
+    class_group_ids = np.empty(len(groups_data), dtype=np.int32)
+    class_group_student_count = np.empty(len(groups_data), dtype=np.int32)
+    for i, group in enumerate(groups_data):
         class_groups[group["id"]] = ClassGroup(
             id=group["id"],
             name=group["name"],
@@ -154,17 +304,33 @@ def parse_timetable_data(data: Dict[str, Any]) -> TimetableData:
             course=courses[group["course_id"]],
             shift=shifts[group["shift_id"]]
         )
+        class_group_index[group["id"]] = i
+        class_group_ids[i] = group["id"]
+        class_group_student_count[i] = group["student_count"]
     
     # Parse ClassAllocations
     class_allocations = {}
-    for idx, allocation in enumerate(data.get("class_allocations", [])):
+    allocations_data = data.get("class_allocations", [])
+    allocation_teacher = np.empty(len(allocations_data), dtype=np.int32)
+    allocation_class_group = np.empty(len(allocations_data), dtype=np.int32)
+    allocation_space_type = np.empty(len(allocations_data), dtype=np.int32)
+    allocation_duration = np.empty(len(allocations_data), dtype=np.int32)
+    for idx, allocation in enumerate(allocations_data):
+        duration = _parse_duration(allocation)
         class_allocations[idx] = ClassAllocation(
             id=allocation.get("id"),
             class_group=class_groups[allocation["class_group_id"]],
             subject=subjects[allocation["subject_id"]],
             teacher=teachers[allocation["teacher_id"]],
-            duration=allocation["duration"]
+            duration=duration,
+            classroom_mask=space_type_classroom_mask.get(
+                subjects[allocation["subject_id"]].required_space_type.id, 0
+            )
         )
+        allocation_teacher[idx] = teacher_index[allocation["teacher_id"]]
+        allocation_class_group[idx] = class_group_index[allocation["class_group_id"]]
+        allocation_space_type[idx] = subjects[allocation["subject_id"]].required_space_type.id
+        allocation_duration[idx] = duration
     
     # Parse auxiliary structures
     teacher_schedules = None
@@ -180,6 +346,24 @@ def parse_timetable_data(data: Dict[str, Any]) -> TimetableData:
         class_groups=class_groups,
         schedules=schedules,
         teacher_schedules=teacher_schedules,
+        classroom_index=classroom_index,
+        classroom_ids=classroom_ids,
+        classroom_capacity=classroom_capacity,
+        classroom_floor=classroom_floor,
+        classroom_space_type=classroom_space_type,
+        classroom_blocked=classroom_blocked,
+        space_type_classroom_mask=space_type_classroom_mask,
+        teacher_index=teacher_index,
+        teacher_ids=teacher_ids,
+        schedule_index=schedule_index,
+        schedule_ids=schedule_ids,
+        class_group_index=class_group_index,
+        class_group_ids=class_group_ids,
+        class_group_student_count=class_group_student_count,
+        allocation_teacher=allocation_teacher,
+        allocation_class_group=allocation_class_group,
+        allocation_space_type=allocation_space_type,
+        allocation_duration=allocation_duration,
     )
 
 
@@ -211,63 +395,86 @@ def process_optimize_timetable(data: Dict[str, Any]) -> Dict[str, Any]:
         filled = result['filled']
         
         # Format result for return
+        placed = [(idx, time_slots) for idx, time_slots in filled.items() if time_slots]
+        
+        # Map every used time row to day and hour at once
+        rows = np.fromiter(
+            (time_slot[0] for _, time_slots in placed for time_slot in time_slots),
+            dtype=np.int64,
+            count=sum(len(time_slots) for _, time_slots in placed),
+        )
+        day_idx, hour_idx = np.divmod(rows, len(HOURS))
+        in_week = ((day_idx < len(DAYS)) & (hour_idx < len(HOURS))).tolist()
+        day_idx = day_idx.tolist()
+        hour_idx = hour_idx.tolist()
+        
+        # Allocations share their group, subject, teacher and room, so each
+        # nested entity dict is built once and referenced from every entry
+        class_group_dicts = {}
+        subject_dicts = {}
+        teacher_dicts = {}
+        classroom_dicts = {}
+        
         optimized_schedule = []
-        for allocation_idx, time_slots in filled.items():
+        offset = 0
+        for allocation_idx, time_slots in placed:
             allocation = timetable_data.class_allocations[allocation_idx]
+            end = offset + len(time_slots)
+            classroom_idx = time_slots[0][1]
+            classroom = timetable_data.classrooms[int(timetable_data.classroom_ids[classroom_idx])]
             
-            if time_slots:
-                classroom_idx = time_slots[0][1]
-                classroom = timetable_data.classrooms[classroom_idx]
-                
-                # Map time to day and hour
-                days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-                hours = list(range(7, 19))  # 7am-6pm
-                
-                time_info = []
-                for time_slot in time_slots:
-                    row = time_slot[0]
-                    day_idx = row // 12
-                    hour_idx = row % 12
-                    
-                    if day_idx < len(days) and hour_idx < len(hours):
-                        time_info.append({
-                            "day": days[day_idx],
-                            "hour": hours[hour_idx]
-                        })
-                
-                optimized_schedule.append({
-                    "allocation_id": allocation.id,
-                    "class_group": {
-                        "id": allocation.class_group.id,
-                        "name": allocation.class_group.name,
-                        "course": allocation.class_group.course.name,
-                        "shift": allocation.class_group.shift.name
-                    },
-                    "subject": {
-                        "id": allocation.subject.id,
-                        "name": allocation.subject.name
-                    },
-                    "teacher": {
-                        "id": allocation.teacher.id,
-                        "name": allocation.teacher.full_name
-                    },
-                    "classroom": {
-                        "id": classroom.id,
-                        "name": classroom.name,
-                        "floor": classroom.floor
-                    },
-                    "time_slots": time_info,
-                    "duration": allocation.duration
-                })
+            time_info = [
+                {"day": DAYS[day_idx[k]], "hour": HOURS[hour_idx[k]]}
+                for k in range(offset, end)
+                if in_week[k]
+            ]
+            offset = end
+            
+            class_group = allocation.class_group
+            class_group_dict = class_group_dicts.get(class_group.id)
+            if class_group_dict is None:
+                class_group_dict = class_group_dicts[class_group.id] = {
+                    "id": class_group.id,
+                    "name": class_group.name,
+                    "course": class_group.course.name,
+                    "shift": class_group.shift.name
+                }
+            subject_dict = subject_dicts.get(allocation.subject.id)
+            if subject_dict is None:
+                subject_dict = subject_dicts[allocation.subject.id] = {
+                    "id": allocation.subject.id,
+                    "name": allocation.subject.name
+                }
+            teacher_dict = teacher_dicts.get(allocation.teacher.id)
+            if teacher_dict is None:
+                teacher_dict = teacher_dicts[allocation.teacher.id] = {
+                    "id": allocation.teacher.id,
+                    "name": allocation.teacher.full_name
+                }
+            classroom_dict = classroom_dicts.get(classroom.id)
+            if classroom_dict is None:
+                classroom_dict = classroom_dicts[classroom.id] = {
+                    "id": classroom.id,
+                    "name": classroom.name,
+                    "floor": classroom.floor
+                }
+            
+            optimized_schedule.append({
+                "allocation_id": allocation.id,
+                "class_group": class_group_dict,
+                "subject": subject_dict,
+                "teacher": teacher_dict,
+                "classroom": classroom_dict,
+                "time_slots": time_info,
+                "duration": allocation.duration
+            })
         
         # Calculate statistics
-        from app.utils.costs import check_hard_constraints
         hard_constraints_cost = check_hard_constraints(matrix, timetable_data)
         
         empty_groups = result.get('groups_empty_space', {})
         empty_teachers = result.get('teachers_empty_space', {})
         
-        from app.utils.costs import empty_space_groups_cost, empty_space_teachers_cost
         groups_cost, max_empty_group, avg_empty_groups = empty_space_groups_cost(empty_groups)
         teachers_cost, max_empty_teacher, avg_empty_teachers = empty_space_teachers_cost(empty_teachers)
         
@@ -304,56 +511,270 @@ def process_optimize_timetable(data: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-def callback(ch, method, properties, body):
-    """Message callback - acknowledges quickly and processes asynchronously"""
+class AckBatcher:
+    """
+    Coalesces acknowledgements of inline-handled messages.
+    
+    Acks are flushed with a single basic_ack(multiple=True) once batch_size
+    messages are pending or flush_interval seconds have passed. multiple=True
+    acknowledges every outstanding delivery up to the tag, so while an
+    optimize_timetable delivery with a lower tag is still running on the worker
+    pool, the pending tags are acked one by one instead. Deferred deliveries
+    finish out of order and are always acked individually.
+    
+    Must only be used from the connection's I/O thread.
+    """
+
+    def __init__(self, channel, connection, batch_size: int = 10, flush_interval: float = 0.05):
+        self._channel = channel
+        self._connection = connection
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = flush_interval
+        self._pending = []  # delivery tags of handled messages, ascending
+        self._in_flight = set()  # delivery tags handed to the worker pool
+        self._timer = None
+
+    def ack(self, delivery_tag: int):
+        """Queues the ack of a message handled inline"""
+        self._pending.append(delivery_tag)
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = self._connection.call_later(self._flush_interval, self._on_timer)
+
+    def defer(self, delivery_tag: int):
+        """Marks a message as being processed on the worker pool"""
+        self._in_flight.add(delivery_tag)
+
+    def ack_deferred(self, delivery_tag: int):
+        """Acknowledges a message that finished on the worker pool"""
+        self._in_flight.discard(delivery_tag)
+        self._channel.basic_ack(delivery_tag=delivery_tag)
+
+    def flush(self):
+        """Acknowledges every pending message"""
+        if self._timer is not None:
+            self._connection.remove_timeout(self._timer)
+            self._timer = None
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, []
+        last_tag = pending[-1]
+        try:
+            if not self._in_flight or min(self._in_flight) > last_tag:
+                self._channel.basic_ack(delivery_tag=last_tag, multiple=True)
+            else:
+                for delivery_tag in pending:
+                    self._channel.basic_ack(delivery_tag=delivery_tag)
+        except Exception as e:
+            logger.warning(f"Error acknowledging messages: {e}")
+
+    def _on_timer(self):
+        self._timer = None
+        self.flush()
+
+
+class OptimizerPool:
+    """
+    Worker processes for optimize_timetable that replace themselves when broken.
+    
+    When a worker dies (OOM kill, segfault), its ProcessPoolExecutor stays
+    broken: the running futures fail and every later submit raises
+    BrokenProcessPool. The executor is then rebuilt, so a crash only fails the
+    solves that were running at the time.
+    
+    Must only be used from the connection's I/O thread.
+    """
+
+    def __init__(self, max_workers: int):
+        self._max_workers = max_workers
+        self._executor = self._create_executor()
+        self.generation = 0  # bumped on every restart
+
+    def _create_executor(self):
+        # Solves are CPU-bound Python, so they run in separate processes to use every
+        # core instead of contending for the GIL. "spawn" keeps the children from
+        # inheriting the parent's broker socket; each loads the JIT kernels once.
+        return ProcessPoolExecutor(
+            max_workers=self._max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(max(1, (os.cpu_count() or 1) // self._max_workers),),
+        )
+
+    def submit(self, fn, *args):
+        """Submits fn to the workers, restarting them once if the pool is broken"""
+        try:
+            return self._executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self.restart(self.generation)
+            return self._executor.submit(fn, *args)
+
+    def restart(self, generation: int):
+        """
+        Replaces a broken executor.
+        
+        Args:
+            generation: Value of self.generation when the failed work was
+                        submitted; futures of an executor that was already
+                        replaced do not restart the new one
+        """
+        if generation != self.generation:
+            return
+        logger.warning("Optimizer worker pool is broken, restarting it")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._create_executor()
+        self.generation += 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def init_worker(num_threads: int):
+    """
+    Initializer of the optimizer worker processes.
+    
+    Numba sizes each process's thread pool to every core, so the parallel
+    kernels of all workers together would oversubscribe the CPU. Each worker
+    gets its share of the cores instead.
+    """
+    set_num_threads(num_threads)
+    warmup()
+
+
+def optimization_error_body(error: Exception) -> bytes:
+    """Encoded error reply for a failed optimize_timetable request"""
+    return dumps({"status": "error", "message": f"Error optimizing timetable: {str(error)}"})
+
+
+def optimize_reply_body(body: bytes) -> bytes:
+    """
+    Worker process entry point for optimize_timetable.
+    
+    Receives the raw message body, which is far cheaper to pickle across the
+    process boundary than the decoded payload, runs the optimization and
+    encodes the reply, so the Pika I/O thread is left with nothing to do but
+    publish and ack.
+    """
+    message = loads(body)
+    return dumps(process_optimize_timetable(message.get("data", {})))
+
+
+def publish_reply(ch, reply_to, correlation_id, body: bytes):
+    """Publish an encoded JSON reply to the reply queue of an RPC-style request"""
+    if reply_to:
+        ch.basic_publish(
+            exchange="",
+            routing_key=reply_to,
+            properties=pika.BasicProperties(correlation_id=correlation_id),
+            body=body,
+        )
+
+
+def schedule_threadsafe(connection, fn):
+    """Run fn on the connection's I/O thread; safe to call from any thread"""
+    try:
+        connection.add_callback_threadsafe(fn)
+    except Exception as e:
+        # Connection already closed; the message will be redelivered
+        logger.warning(f"Could not schedule callback on connection: {e}")
+
+
+def schedule_keepalive(connection, interval: float):
+    """
+    Wakes the connection's I/O loop at least every interval seconds.
+    
+    Long solves run on worker processes while the main thread sits in
+    start_consuming; the periodic timer keeps that loop cycling (and servicing
+    heartbeats and threadsafe callbacks) even when no messages arrive.
+    """
+    def tick():
+        connection.call_later(interval, tick)
+
+    connection.call_later(interval, tick)
+
+
+def reply_and_ack(ch, acks, pool, generation, delivery_tag, reply_to, correlation_id, future):
+    """
+    Publishes the result of a finished optimization and acknowledges its message.
+    
+    Must run on the connection's I/O thread, so it is scheduled through
+    connection.add_callback_threadsafe from the worker's done callback.
+    """
+    if not ch.is_open:
+        # The broker redelivers unacknowledged messages once we reconnect
+        logger.warning(f"Channel closed before reply for correlation_id: {correlation_id}")
+        return
+
+    try:
+        body = future.result()
+    except BrokenProcessPool as e:
+        # A worker died; the request still gets an error reply
+        logger.error(f"Worker process died while optimizing timetable: {e}")
+        pool.restart(generation)
+        body = optimization_error_body(e)
+    except Exception as e:
+        logger.error(f"Error optimizing timetable: {e}", exc_info=True)
+        body = optimization_error_body(e)
+
+    try:
+        publish_reply(ch, reply_to, correlation_id, body)
+        if reply_to:
+            logger.info(f"Response sent for correlation_id: {correlation_id}")
+    except Exception as e:
+        logger.error(f"Error sending response: {e}", exc_info=True)
+
+    try:
+        acks.ack_deferred(delivery_tag)
+    except Exception as e:
+        logger.warning(f"Error acknowledging message: {e}")
+
+
+def callback(ch, method, properties, body, pool, acks):
+    """
+    Message callback.
+    
+    Cheap commands are answered inline. optimize_timetable is handed to the
+    worker pool so the Pika I/O thread keeps serving heartbeats and other
+    deliveries; its reply and ack are published from the I/O thread once the
+    solve finishes.
+    """
     correlation_id = properties.correlation_id
+    deferred = False
 
     try:
         logger.info(f"Received message: {correlation_id}")
-        message = json.loads(body)
-        command = message.get("pattern")
+        command = peek_pattern(body)
 
         if command == "test_connection":
-            result = {"status": "success", "message": "Connection established"}
-
             # Send response and acknowledge immediately
-            if properties.reply_to:
-                ch.basic_publish(
-                    exchange="",
-                    routing_key=properties.reply_to,
-                    properties=pika.BasicProperties(correlation_id=correlation_id),
-                    body=json.dumps(result),
-                )
+            publish_reply(ch, properties.reply_to, correlation_id, TEST_CONNECTION_BODY)
 
         elif command == "optimize_timetable":
             logger.info("Processing optimize_timetable request")
             
-            # Extract data from message
-            timetable_data = message.get("data", {})
-            
-            # Process optimization
-            result = process_optimize_timetable(timetable_data)
-            
-            # Send response
-            if properties.reply_to:
-                ch.basic_publish(
-                    exchange="",
-                    routing_key=properties.reply_to,
-                    properties=pika.BasicProperties(correlation_id=correlation_id),
-                    body=json.dumps(result),
+            # Process optimization on a worker process
+            connection = ch.connection
+            try:
+                future = pool.submit(optimize_reply_body, body)
+            except Exception as e:
+                # Answer instead of dropping the request when no worker can take it
+                logger.error(f"Could not submit optimize_timetable request: {e}", exc_info=True)
+                publish_reply(ch, properties.reply_to, correlation_id, optimization_error_body(e))
+            else:
+                on_done = functools.partial(
+                    reply_and_ack, ch, acks, pool, pool.generation, method.delivery_tag,
+                    properties.reply_to, correlation_id
+                )
+                acks.defer(method.delivery_tag)
+                deferred = True
+                future.add_done_callback(
+                    lambda fut: schedule_threadsafe(connection, functools.partial(on_done, fut))
                 )
-                logger.info(f"Response sent for correlation_id: {correlation_id}")
 
         else:
-            result = {"status": "error", "message": f"Unknown command: {command}"}
-
-            if properties.reply_to:
-                ch.basic_publish(
-                    exchange="",
-                    routing_key=properties.reply_to,
-                    properties=pika.BasicProperties(correlation_id=correlation_id),
-                    body=json.dumps(result),
-                )
+            publish_reply(ch, properties.reply_to, correlation_id, unknown_command_body(str(command)))
 
     except json.JSONDecodeError as e:
         logger.error(f"Invalid JSON in message: {e}")
@@ -362,11 +783,9 @@ def callback(ch, method, properties, body):
         logger.error(f"Unexpected error in callback: {e}", exc_info=True)
 
     finally:
-        # Acknowledge the message (except for process_assignments which is handled above)
-        try:
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-        except Exception as e:
-            logger.warning(f"Error acknowledging message: {e}")
+        # Acknowledge the message (optimize_timetable is acknowledged by reply_and_ack)
+        if not deferred:
+            acks.ack(method.delivery_tag)
 
 
 def create_connection_and_channel(rabbitmq_config):
@@ -391,7 +810,15 @@ def create_connection_and_channel(rabbitmq_config):
     # Configure channel
     queue_name = rabbitmq_config["queue_name"]
     channel.queue_declare(queue=queue_name, durable=True)
-    channel.basic_qos(prefetch_count=1)
+
+    # A prefetch window larger than 1 lets the broker keep shipping messages
+    # while earlier ones are being acked, instead of paying a full round trip
+    # per message. Deployments whose handlers take seconds per message (long
+    # optimize_timetable solves) should lower RABBITMQ_PREFETCH_COUNT so that
+    # buffered messages are not held back from other consumers.
+    channel.basic_qos(
+        prefetch_count=rabbitmq_config.get("prefetch_count", 100), global_qos=False
+    )
 
     return connection, channel, queue_name
 
@@ -399,13 +826,25 @@ def create_connection_and_channel(rabbitmq_config):
 def start_consumer():
     """Start the RabbitMQ consumer with improved reconnection logic"""
     rabbitmq_config = get_rabbitmq_config()
+    app_config = get_app_config()
+    pool = OptimizerPool(app_config["optimizer_max_workers"])
+
     max_reconnect_attempts = 10
-    reconnect_delay = 5
+    initial_reconnect_delay = 5
+    reconnect_delay = initial_reconnect_delay
+    # Never wait longer than half a heartbeat between attempts
+    max_reconnect_delay = 60
+    if rabbitmq_config["heartbeat"] > 0:
+        max_reconnect_delay = min(max_reconnect_delay, rabbitmq_config["heartbeat"] / 2)
+    # Uptime after which a dropped connection counts as a fresh failure
+    stable_connection_seconds = 60
     current_attempt = 0
 
     while current_attempt < max_reconnect_attempts:
         connection = None
         channel = None
+        acks = None
+        connected_at = None
 
         try:
             logger.info(
@@ -416,10 +855,13 @@ def start_consumer():
                 rabbitmq_config
             )
 
-            # Reset attempt counter on successful connection
-            current_attempt = 0
+            connected_at = time.monotonic()
 
-            channel.basic_consume(queue=queue_name, on_message_callback=callback)
+            acks = AckBatcher(channel, connection, rabbitmq_config["ack_batch_size"])
+            on_message = functools.partial(callback, pool=pool, acks=acks)
+            channel.basic_consume(queue=queue_name, on_message_callback=on_message)
+            if rabbitmq_config["heartbeat"] > 0:
+                schedule_keepalive(connection, max(1, rabbitmq_config["heartbeat"] // 3))
 
             logger.info(f"Consumer started, listening on queue: {queue_name}")
             channel.start_consuming()
@@ -450,6 +892,8 @@ def start_consumer():
         finally:
             # Clean up connections
             try:
+                if acks and channel and channel.is_open:
+                    acks.flush()
                 if channel and not channel.is_closed:
                     channel.stop_consuming()
                     channel.close()
@@ -462,16 +906,29 @@ def start_consumer():
             except Exception as e:
                 logger.warning(f"Error closing connection: {e}")
 
+        # A connection that dies right after opening keeps backing off; only one
+        # that stayed up long enough resets the attempt counter and the delay
+        if (
+            connected_at is not None
+            and time.monotonic() - connected_at > stable_connection_seconds
+        ):
+            current_attempt = min(current_attempt, 1)
+            reconnect_delay = initial_reconnect_delay
+
         if current_attempt < max_reconnect_attempts:
-            logger.info(f"Reconnecting in {reconnect_delay} seconds...")
-            time.sleep(reconnect_delay)
-            # Exponential backoff with max delay of 60 seconds
-            reconnect_delay = min(reconnect_delay * 1.5, 60)
+            # Jitter keeps consumers from reconnecting in lockstep after a broker restart
+            delay = min(reconnect_delay, max_reconnect_delay) * random.uniform(0.7, 1.3)
+            logger.info(f"Reconnecting in {delay:.1f} seconds...")
+            time.sleep(delay)
+            # Exponential backoff, capped at max_reconnect_delay
+            reconnect_delay = min(reconnect_delay * 1.5, max_reconnect_delay)
 
     logger.error(
         f"Max reconnection attempts ({max_reconnect_attempts}) reached. Exiting."
     )
 
+    pool.shutdown()
+
 
 if __name__ == "__main__":
     start_consumer()
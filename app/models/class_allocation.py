@@ -7,7 +7,7 @@ from app.models.classroom import Classroom
 from app.models.schedule import Schedule
 
 
-@dataclass()
+@dataclass(slots=True)
 class ClassAllocation:
     """Represents a class allocation in the timetable"""
 
@@ -18,13 +18,15 @@ class ClassAllocation:
     duration: int  # in hours
     schedule: Optional["Schedule"] = None  # allocated schedule
     classroom: Optional["Classroom"] = None  # allocated classroom
+    classroom_mask: int = 0  # bit i set = classroom column i has the required space_type
     
     @property
     def possible_classrooms(self) -> List[int]:
         """Returns the classrooms compatible with the space type required by the subject"""
-        # Will be filled during initialization based on the subject's space_type
-        return self._possible_classrooms if hasattr(self, '_possible_classrooms') else []
-    
-    @possible_classrooms.setter
-    def possible_classrooms(self, value: List[int]):
-        self._possible_classrooms = value
+        # Walk the set bits of the mask, lowest classroom column first
+        classrooms = []
+        mask = self.classroom_mask
+        while mask:
+            classrooms.append((mask & -mask).bit_length() - 1)
+            mask &= mask - 1
+        return classrooms
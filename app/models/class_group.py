@@ -3,7 +3,7 @@ from app.models.course import Course
 from app.models.shift import Shift
 
 
-@dataclass()
+@dataclass(slots=True, frozen=True)
 class ClassGroup:
     """
     Represents a class group (turma) in the timetable system.
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from app.models.space_type import SpaceType
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Classroom:
     """
     Represents a physical classroom or learning space.
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from app.models.course_type import CourseType
 
 
-@dataclass()
+@dataclass(slots=True, frozen=True)
 class Course:
     """
     Represents an academic course or degree program.
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass()
+@dataclass(slots=True, frozen=True)
 class CourseType:
     """
     Represents the type of academic degree or program.
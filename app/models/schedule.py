@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass()
+@dataclass(slots=True, frozen=True)
 class Schedule:
     """
     Represents a time slot in the weekly schedule.
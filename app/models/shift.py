@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass()
+@dataclass(slots=True, frozen=True)
 class Shift:
     """
     Represents a time shift for class groups.
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass()
+@dataclass(slots=True, frozen=True)
 class SpaceType:
     """
     Represents the type of physical space or classroom.
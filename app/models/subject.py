@@ -3,7 +3,7 @@ from app.models.course import Course
 from app.models.space_type import SpaceType
 
 
-@dataclass()
+@dataclass(slots=True, frozen=True)
 class Subject:
     """
     Represents an academic subject or discipline.
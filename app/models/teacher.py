@@ -4,7 +4,7 @@ from app.models.schedule import Schedule
 from app.models.subject import Subject
 
 
-@dataclass()
+@dataclass(slots=True)
 class Teacher:
     """
     Represents a teacher or instructor.
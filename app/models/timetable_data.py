@@ -1,5 +1,8 @@
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+import numpy as np
+
 from app.models.class_allocation import ClassAllocation
 from app.models.class_group import ClassGroup
 from app.models.classroom import Classroom
@@ -31,6 +34,13 @@ class TimetableData:
                           Defines when each teacher is available (SCHEDULE_TEACHER table)
         subject_teachers: Optional map of subject ID to list of qualified teacher IDs
                          Defines which teachers can teach each subject (SUBJECT_TEACHER table)
+    
+    Structure-of-Arrays view:
+        Each entity also gets a stable dense index (its position in the input
+        list) and one contiguous NumPy array per field, so the solver can
+        traverse plain arrays instead of chasing object attributes. The
+        *_index dicts map entity ID to dense index and are only meant for
+        deserialization. The timetable matrix columns are classroom indices.
     """
 
     class_allocations: Dict[int, ClassAllocation]  # index -> allocation (ASSIGNMENT)
@@ -42,3 +52,33 @@ class TimetableData:
     # Auxiliary structures for optimization
     teacher_schedules: Dict[int, List[int]] = None  # teacher_id -> [schedule_ids] (SCHEDULE_TEACHER)
     subject_teachers: Dict[int, List[int]] = None  # subject_id -> [teacher_ids] (SUBJECT_TEACHER)
+
+    # Structure-of-Arrays view (entity ID -> dense index, one array per field)
+    classroom_index: Dict[int, int] = None  # classroom id -> column
+    classroom_ids: Optional[np.ndarray] = None  # int32 [column] -> classroom id
+    classroom_capacity: Optional[np.ndarray] = None  # int32
+    classroom_floor: Optional[np.ndarray] = None  # int32
+    classroom_space_type: Optional[np.ndarray] = None  # int32, space_type id
+    classroom_blocked: Optional[np.ndarray] = None  # bool_
+    space_type_classroom_mask: Dict[int, int] = None  # space_type id -> bitmask of usable columns
+
+    teacher_index: Dict[int, int] = None  # teacher id -> index
+    teacher_ids: Optional[np.ndarray] = None  # int32
+
+    schedule_index: Dict[int, int] = None  # schedule id -> index
+    schedule_ids: Optional[np.ndarray] = None  # int32
+
+    class_group_index: Dict[int, int] = None  # class group id -> index
+    class_group_ids: Optional[np.ndarray] = None  # int32
+    class_group_student_count: Optional[np.ndarray] = None  # int32
+
+    allocation_teacher: Optional[np.ndarray] = None  # int32, teacher index
+    allocation_class_group: Optional[np.ndarray] = None  # int32, class group index
+    allocation_space_type: Optional[np.ndarray] = None  # int32, required space_type id
+    allocation_duration: Optional[np.ndarray] = None  # int32, in hours
+
+    # Lookup tables filled in by optimize_timetable
+    row_to_schedule: Optional[np.ndarray] = None  # int32 [matrix row] -> schedule id, -1 if none
+    teacher_row_allowed: Optional[np.ndarray] = None  # bool_ [teacher index][matrix row]
+    valid_start_rows: Optional[np.ndarray] = None  # bool_ [max_duration + 1, n_rows], block stays in one day
+    allocation_room_ok: Optional[np.ndarray] = None  # bool_ [allocation][column], room fits the space_type
@@ -1,22 +1,72 @@
-import random
 from operator import itemgetter
-from typing import Dict, List, Tuple, Optional
-import copy
+from typing import Callable, Dict, List, Tuple, Optional
 import math
+import numpy as np
 from app.models.timetable_data import TimetableData
-from app.models.schedule import Schedule
+from app.utils.jit import njit, prange
 from app.utils.costs import (
-    check_hard_constraints, 
+    EmptySpaceCost,
+    HardConstraintsCost,
+    check_hard_constraints,
     hard_constraints_cost, 
-    empty_space_groups_cost, 
-    empty_space_teachers_cost,
+    map_row_to_schedule,
+    warmup as warmup_costs,
 )
+from app.utils.utils import (
+    load_data_from_database,
+    set_up,
+    show_statistics,
+    show_timetable,
+)
+
+
+def add_time(times: np.ndarray, time: int):
+    """
+    Adds one class at the given row to an empty-space histogram.
+    
+    Args:
+        times: [row] = number of classes a class group or teacher has at that row
+        time: Matrix row of the class
+    """
+    times[time] += 1
+
+
+def remove_time(times: np.ndarray, time: int):
+    """
+    Removes one class at the given row from an empty-space histogram.
+    
+    Args:
+        times: [row] = number of classes a class group or teacher has at that row
+        time: Matrix row of the class
+    """
+    times[time] -= 1
+
+
+def free_blocks(free: np.ndarray, duration: int) -> np.ndarray:
+    """
+    Marks the slots where a class of the given duration can start, i.e. the slot
+    and the duration - 1 slots after it in the same room are all free.
+    
+    Args:
+        free: Boolean mask [time][room], True where the slot is free
+        duration: Duration of the class in time slots
+        
+    Returns:
+        Boolean mask [time][room], False where the block would not fit
+    """
+    blocks = np.zeros_like(free)
+    num_starts = len(free) - duration + 1
+    if num_starts > 0:
+        blocks[:num_starts] = free[:num_starts]
+        for i in range(1, duration):
+            blocks[:num_starts] &= free[i:i + num_starts]
+    return blocks
 
 
-def initial_population(data: TimetableData, matrix: List[List], free: List[Tuple[int, int]], 
+def initial_population(data: TimetableData, matrix: np.ndarray, free: np.ndarray, 
                       filled: Dict[int, List[Tuple[int, int]]], 
-                      groups_empty_space: Dict[int, List[int]], 
-                      teachers_empty_space: Dict[int, List[int]]):
+                      groups_empty_space: Dict[int, np.ndarray], 
+                      teachers_empty_space: Dict[int, np.ndarray]):
     """
     Sets up the initial timetable for classes, inserting them in free slots so that
     each class is in an appropriate room.
@@ -24,112 +74,46 @@ def initial_population(data: TimetableData, matrix: List[List], free: List[Tuple
     Args:
         data: Timetable data (ASSIGNMENT, SPACE, USER, CLASS_GROUP, etc)
         matrix: Timetable matrix [time][room] = allocation_index
-        free: List of free slots (time, room)
+        free: Boolean mask [time][room], True where the slot is free
         filled: Dictionary of allocations {allocation_index: [(time, room), ...]}
-        groups_empty_space: Empty spaces by class group {class_group_id: [times]}
-        teachers_empty_space: Empty spaces by teacher {teacher_id: [times]}
+        groups_empty_space: Empty spaces by class group {class_group_id: [row] = classes at that row}
+        teachers_empty_space: Empty spaces by teacher {teacher_id: [row] = classes at that row}
     """
     allocations = data.class_allocations
 
     for index, allocation in allocations.items():
-        ind = 0
-        while True:
-            if ind >= len(free):
-                # Could not allocate this class
-                print(f"Warning: Could not allocate class {index}")
-                break
-                
-            start_field = free[ind]
-
-            # Check if the class doesn't start on one day and end on the next
-            start_time = start_field[0]
-            end_time = start_time + int(allocation.duration) - 1
-            if start_time % 12 > end_time % 12:
-                ind += 1
-                continue
-
-            found = True
-            # Check if the entire block for the class is free
-            for i in range(1, int(allocation.duration)):
-                field = (i + start_time, start_field[1])
-                if field not in free:
-                    found = False
-                    ind += 1
-                    break
+        # Candidate start slots in appropriate rooms (space_type) where the entire
+        # block for the class is free and doesn't start on one day and end on the
+        # next, scanned in row-major (time, room) order
+        candidates = (free_blocks(free, allocation.duration)
+                      & data.valid_start_rows[allocation.duration][:, None]
+                      & data.allocation_room_ok[index])
+        free_times, free_rooms = np.nonzero(candidates)
+        for start_time, classroom_id in zip(free_times.tolist(), free_rooms.tolist()):
+            end_time = start_time + allocation.duration - 1
+
+            # Add class times for the class group
+            class_group_id = allocation.class_group.id
+            
+            for i in range(allocation.duration):
+                add_time(groups_empty_space[class_group_id], i + start_time)
 
-            # Ensure the room is appropriate (check space_type)
-            classroom_id = start_field[1]
-            if classroom_id not in allocation.possible_classrooms:
-                ind += 1
-                continue
+            # Add class times for the teacher
+            teacher_id = allocation.teacher.id
+            for i in range(allocation.duration):
+                add_time(teachers_empty_space[teacher_id], i + start_time)
 
-            if found:
-                # Add class times for the class group
-                class_group_id = allocation.class_group.id
-                
-                for i in range(int(allocation.duration)):
-                    if class_group_id not in groups_empty_space:
-                        groups_empty_space[class_group_id] = []
-                    groups_empty_space[class_group_id].append(i + start_time)
-
-                for i in range(int(allocation.duration)):
-                    filled.setdefault(index, []).append((i + start_time, start_field[1]))
-                    free.remove((i + start_time, start_field[1]))
-                    
-                    # Add class times for the teacher
-                    teacher_id = allocation.teacher.id
-                    if teacher_id not in teachers_empty_space:
-                        teachers_empty_space[teacher_id] = []
-                    teachers_empty_space[teacher_id].append(i + start_time)
-                break
+            filled[index] = [(start_time + i, classroom_id) for i in range(allocation.duration)]
+            free[start_time:end_time + 1, classroom_id] = False
+            break
+        else:
+            # Could not allocate this class
+            print(f"Warning: Could not allocate class {index}")
 
     # Fill the matrix
     for index, fields_list in filled.items():
         for field in fields_list:
-            matrix[field[0]][field[1]] = index
-
-
-def map_row_to_schedule(row: int, schedules: Dict[int, "Schedule"]) -> Optional[int]:
-    """
-    Maps a matrix row (time slot) to a Schedule ID.
-    
-    The matrix uses indices 0-59 representing:
-    - 0-11: Monday (7am-6pm)
-    - 12-23: Tuesday (7am-6pm)
-    - 24-35: Wednesday (7am-6pm)
-    - 36-47: Thursday (7am-6pm)
-    - 48-59: Friday (7am-6pm)
-    
-    Args:
-        row: Matrix row (0-59)
-        schedules: Dictionary of schedules {id: Schedule}
-        
-    Returns:
-        Corresponding schedule_id or None if not found
-    """
-    if not schedules:
-        return None
-    
-    # Map index to weekday and hour
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-    day_index = row // 12
-    hour_index = row % 12
-    
-    if day_index >= len(days):
-        return None
-        
-    weekday = days[day_index]
-    # Assuming schedules starting at 7am
-    hour = 7 + hour_index
-    start_time = f"{hour:02d}:00"
-    
-    # Search for corresponding schedule
-    for schedule_id, schedule in schedules.items():
-        if (schedule.weekday == weekday and 
-            schedule.start_time.startswith(f"{hour:02d}:")):
-            return schedule_id
-    
-    return None
+            matrix[field] = index
 
 
 def exchange_two(matrix, filled, ind1, ind2):
@@ -152,7 +136,28 @@ def exchange_two(matrix, filled, ind1, ind2):
     return matrix
 
 
-def valid_teacher_group_row(matrix: List[List], data: TimetableData, 
+@njit("boolean(int32[::1], int32[::1], int32[::1], int32, int32)", cache=True)
+def _conflict(matrix_row, teacher_of, group_of, my_t, my_g):
+    """
+    Checks if any allocation in a matrix row has the given teacher or class group.
+    
+    Args:
+        matrix_row: One row of the timetable matrix, -1 for free slots
+        teacher_of: Teacher index of each allocation
+        group_of: Class group index of each allocation
+        my_t: Teacher index to look for
+        my_g: Class group index to look for
+        
+    Returns:
+        True if the teacher or the class group is already busy in that row
+    """
+    for field in matrix_row:
+        if field >= 0 and (teacher_of[field] == my_t or group_of[field] == my_g):
+            return True
+    return False
+
+
+def valid_teacher_group_row(matrix: np.ndarray, data: TimetableData, 
                            allocation_index: int, row: int) -> bool:
     """
     Checks if the allocation can be at that row due to possible overlaps
@@ -167,45 +172,271 @@ def valid_teacher_group_row(matrix: List[List], data: TimetableData,
     Returns:
         True if there are no conflicts, False otherwise
     """
-    allocation1 = data.class_allocations[allocation_index]
-    
     # VALIDATION 1: Check teacher availability (SCHEDULE_TEACHER)
-    if data.teacher_schedules is not None:
-        teacher_id = allocation1.teacher.id
-        
-        # If there are schedule restrictions for this teacher
-        if teacher_id in data.teacher_schedules:
-            available_schedule_ids = data.teacher_schedules[teacher_id]
-            
-            # If there are defined restrictions (non-empty list)
-            if available_schedule_ids:
-                # Map matrix row to a schedule_id
-                schedule_id = map_row_to_schedule(row, data.schedules)
-                
-                # If schedule not found or teacher not available, invalidate
-                if schedule_id is None or schedule_id not in available_schedule_ids:
-                    return False
+    if not data.teacher_row_allowed[data.allocation_teacher[allocation_index], row]:
+        return False
     
     # VALIDATION 2: Check for teacher and class group conflicts at the same time
-    for j in range(len(matrix[row])):
-        if matrix[row][j] is not None:
-            allocation2 = data.class_allocations[matrix[row][j]]
-            
-            # Check for teacher conflict
-            if allocation1.teacher.id == allocation2.teacher.id:
-                return False
-            
-            # Check for class group conflict
-            if allocation1.class_group.id == allocation2.class_group.id:
-                return False
+    if _conflict(matrix[row], data.allocation_teacher, data.allocation_class_group,
+                 data.allocation_teacher[allocation_index],
+                 data.allocation_class_group[allocation_index]):
+        return False
                 
     return True
 
 
-def mutate_ideal_spot(matrix: List[List], data: TimetableData, allocation_index: int, 
-                     free: List[Tuple[int, int]], filled: Dict[int, List[Tuple[int, int]]], 
-                     groups_empty_space: Dict[int, List[int]], 
-                     teachers_empty_space: Dict[int, List[int]]):
+@njit("UniTuple(int64, 2)(int32[:, ::1], boolean[:, ::1], boolean[::1], boolean[::1], "
+      "boolean[::1], int32[::1], int32[::1], int32, int32, int64)",
+      cache=True)
+def _find_spot(matrix, free, room_ok, valid_start, row_allowed, teacher_of, group_of,
+               my_t, my_g, duration):
+    """
+    Finds the first block, in row-major (time, room) order, where an allocation
+    fits without breaking a hard constraint.
+    
+    Args:
+        matrix: Timetable matrix [time][room] = allocation_index, -1 for free slots
+        free: Boolean mask [time][room], True where the slot is free
+        room_ok: [room] = room has the space_type the allocation requires
+        valid_start: [time] = a block of this duration starting there stays in one day
+        row_allowed: [time] = the teacher is available
+        teacher_of: Teacher index of each allocation
+        group_of: Class group index of each allocation
+        my_t: Teacher index of the allocation
+        my_g: Class group index of the allocation
+        duration: Duration of the allocation in time slots
+        
+    Returns:
+        start_time, classroom_id of the block, or (-1, -1) if there is none
+    """
+    rows, cols = matrix.shape
+
+    # Number of consecutive rows from each row on where the teacher is
+    # available and neither teacher nor group is busy, filled bottom-up so a
+    # whole block is checked with a single comparison
+    usable_run = np.zeros(rows + 1, dtype=np.int64)
+    for t in range(rows - 1, -1, -1):
+        if row_allowed[t] and not _conflict(matrix[t], teacher_of, group_of, my_t, my_g):
+            usable_run[t] = usable_run[t + 1] + 1
+
+    for start_time in range(rows - duration + 1):
+        if not valid_start[start_time] or usable_run[start_time] < duration:
+            continue
+
+        for classroom_id in range(cols):
+            if not room_ok[classroom_id]:
+                continue
+            block_free = True
+            for i in range(duration):
+                if not free[start_time + i, classroom_id]:
+                    block_free = False
+                    break
+            if block_free:
+                return start_time, classroom_id
+
+    return -1, -1
+
+
+@njit("int64[:, ::1](int64[::1], int32[:, ::1], boolean[:, ::1], boolean[:, ::1], "
+      "boolean[:, ::1], boolean[:, ::1], int32[::1], int32[::1], int32[::1])",
+      parallel=True, cache=True)
+def _propose_spots(allocations, matrix, free, room_ok, valid_start_rows, teacher_row_allowed,
+                   teacher_of, group_of, durations):
+    """
+    Runs _find_spot for several allocations in parallel on the same matrix.
+    
+    The matrix and masks are only read, so the allocations need no locking;
+    committing the moves is left to the caller.
+    
+    Args:
+        allocations: Allocation indices, without repeats
+        matrix: Timetable matrix
+        free: Boolean mask of free slots
+        room_ok: [allocation][room] = room fits the allocation
+        valid_start_rows: [duration][time] = a block starting there stays in one day
+        teacher_row_allowed: [teacher][time] = teacher is available
+        teacher_of: Teacher index of each allocation
+        group_of: Class group index of each allocation
+        durations: Duration of each allocation
+        
+    Returns:
+        [k] = (start_time, classroom_id) proposed for allocations[k], (-1, -1) if none
+    """
+    spots = np.empty((len(allocations), 2), dtype=np.int64)
+    for k in prange(len(allocations)):
+        index = allocations[k]
+        my_t = teacher_of[index]
+        start_time, classroom_id = _find_spot(
+            matrix, free, room_ok[index], valid_start_rows[durations[index]],
+            teacher_row_allowed[my_t], teacher_of, group_of, my_t, group_of[index],
+            durations[index],
+        )
+        spots[k, 0] = start_time
+        spots[k, 1] = classroom_id
+    return spots
+
+
+def warmup():
+    """
+    Runs the cost kernels and the spot search kernels once on tiny dummy inputs,
+    so an optimizer worker loads them at startup rather than on its first solve.
+    """
+    warmup_costs()
+    matrix = np.full((12, 1), -1, dtype=np.int32)
+    free = np.ones((12, 1), dtype=np.bool_)
+    ids = np.zeros(1, dtype=np.int32)
+    room_ok = np.ones((1, 1), dtype=np.bool_)
+    valid_start_rows = np.ones((2, 12), dtype=np.bool_)
+    row_allowed = np.ones((1, 12), dtype=np.bool_)
+    _find_spot(matrix, free, room_ok[0], valid_start_rows[1], row_allowed[0], ids, ids,
+               np.int32(0), np.int32(0), 1)
+    _propose_spots(np.zeros(1, dtype=np.int64), matrix, free, room_ok, valid_start_rows,
+                   row_allowed, ids, ids, np.ones(1, dtype=np.int32))
+
+
+def find_ideal_spot(matrix: np.ndarray, data: TimetableData, allocation_index: int,
+                    free: np.ndarray) -> Tuple[int, int]:
+    """
+    Finds the first free block where the allocation has no hard constraint cost.
+    
+    Args:
+        matrix: Timetable matrix
+        data: Timetable data
+        allocation_index: Allocation index
+        free: Boolean mask of free slots
+        
+    Returns:
+        start_time, classroom_id of the block, or (-1, -1) if there is none
+    """
+    my_t = data.allocation_teacher[allocation_index]
+    duration = data.allocation_duration[allocation_index]
+    return _find_spot(matrix, free, data.allocation_room_ok[allocation_index],
+                      data.valid_start_rows[duration],
+                      data.teacher_row_allowed[my_t], data.allocation_teacher,
+                      data.allocation_class_group, my_t,
+                      data.allocation_class_group[allocation_index], duration)
+
+
+def propose_ideal_spots(matrix: np.ndarray, data: TimetableData, allocation_indices: List[int],
+                        free: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Finds an ideal spot for several distinct allocations at once, in parallel.
+    
+    Every spot is searched on the current matrix, as if no other allocation moved.
+    
+    Args:
+        matrix: Timetable matrix
+        data: Timetable data
+        allocation_indices: Allocation indices, without repeats
+        free: Boolean mask of free slots
+        
+    Returns:
+        (start_time, classroom_id) per allocation, (-1, -1) where there is none
+    """
+    return _propose_spots(np.asarray(allocation_indices, dtype=np.int64), matrix, free,
+                          data.allocation_room_ok, data.valid_start_rows,
+                          data.teacher_row_allowed, data.allocation_teacher,
+                          data.allocation_class_group, data.allocation_duration).tolist()
+
+
+def spot_available(matrix: np.ndarray, data: TimetableData, allocation_index: int,
+                   free: np.ndarray, start_time: int, classroom_id: int) -> bool:
+    """
+    Checks if a block found earlier is still free and free of conflicts.
+    
+    Args:
+        matrix: Timetable matrix
+        data: Timetable data
+        allocation_index: Allocation index
+        free: Boolean mask of free slots
+        start_time: First row of the block
+        classroom_id: Column of the block
+        
+    Returns:
+        True if the allocation can still be moved there
+    """
+    duration = int(data.allocation_duration[allocation_index])
+    if not free[start_time:start_time + duration, classroom_id].all():
+        return False
+    return all(valid_teacher_group_row(matrix, data, allocation_index, start_time + i)
+               for i in range(duration))
+
+
+def move_allocation(matrix: np.ndarray, data: TimetableData, allocation_index: int,
+                    start_time: int, classroom_id: int,
+                    free: np.ndarray, filled: Dict[int, List[Tuple[int, int]]], 
+                    groups_empty_space: Dict[int, np.ndarray], 
+                    teachers_empty_space: Dict[int, np.ndarray],
+                    journal: Optional[List[Tuple[Callable, tuple]]] = None):
+    """
+    Moves a placed allocation to the block starting at (start_time, classroom_id).
+    
+    Args:
+        matrix: Timetable matrix
+        data: Timetable data
+        allocation_index: Allocation index
+        start_time: First row of the new block
+        classroom_id: Column of the new block
+        free: Boolean mask of free slots
+        filled: Dictionary of filled allocations
+        groups_empty_space: Empty spaces by class group
+        teachers_empty_space: Empty spaces by teacher
+        journal: Optional list that receives an (inverse, args) pair for every
+                 change made to filled and the empty spaces, so the move can be
+                 reverted with undo(); matrix and free are not recorded, callers
+                 that roll back keep a copy of them
+    """
+    if journal is None:
+        journal = []
+        
+    fields = filled[allocation_index]
+    duration = int(data.allocation_duration[allocation_index])
+    end_time = start_time + duration - 1
+
+    # The empty spaces are keyed by entity ID, so resolve both histograms once
+    allocation = data.class_allocations[allocation_index]
+    group_times = groups_empty_space[allocation.class_group.id]
+    teacher_times = teachers_empty_space[allocation.teacher.id]
+
+    # Remove current class from filled and add to free
+    filled.pop(allocation_index, None)
+    journal.append((filled.__setitem__, (allocation_index, fields)))
+    for f in fields:
+        free[f[0], f[1]] = True
+        matrix[f] = -1
+        
+        # Remove empty space from class group at old position
+        if group_times[f[0]] > 0:
+            remove_time(group_times, f[0])
+            journal.append((add_time, (group_times, f[0])))
+        
+        # Remove empty space from teacher at old position
+        if teacher_times[f[0]] > 0:
+            remove_time(teacher_times, f[0])
+            journal.append((add_time, (teacher_times, f[0])))
+
+    # Add empty space for the class group
+    for i in range(duration):
+        add_time(group_times, i + start_time)
+        journal.append((remove_time, (group_times, i + start_time)))
+
+    # Add new class time, mark slots as taken and insert in matrix
+    filled[allocation_index] = [(start_time + i, classroom_id) for i in range(duration)]
+    journal.append((filled.pop, (allocation_index,)))
+    matrix[start_time:end_time + 1, classroom_id] = allocation_index
+    free[start_time:end_time + 1, classroom_id] = False
+
+    # Add new empty space for the teacher
+    for i in range(duration):
+        add_time(teacher_times, i + start_time)
+        journal.append((remove_time, (teacher_times, i + start_time)))
+
+
+def mutate_ideal_spot(matrix: np.ndarray, data: TimetableData, allocation_index: int, 
+                     free: np.ndarray, filled: Dict[int, List[Tuple[int, int]]], 
+                     groups_empty_space: Dict[int, np.ndarray], 
+                     teachers_empty_space: Dict[int, np.ndarray],
+                     journal: Optional[List[Tuple[Callable, tuple]]] = None):
     """
     Tries to find new slots in the matrix for the allocation where the cost is 0
     (considering only hard constraints). If an optimal spot is found,
@@ -215,89 +446,44 @@ def mutate_ideal_spot(matrix: List[List], data: TimetableData, allocation_index:
         matrix: Timetable matrix
         data: Timetable data
         allocation_index: Allocation index
-        free: List of free slots
+        free: Boolean mask of free slots
         filled: Dictionary of filled allocations
         groups_empty_space: Empty spaces by class group
         teachers_empty_space: Empty spaces by teacher
+        journal: Optional list for the changes to filled and the empty spaces,
+                 see move_allocation
     """
     # Find rows and slots where the class currently is
     if allocation_index not in filled:
         return
-        
-    fields = filled[allocation_index]
-    allocation = data.class_allocations[allocation_index]
-    
-    ind = 0
-    while True:
-        # Ideal spot not found, return from function
-        if ind >= len(free):
-            return
-        start_field = free[ind]
-
-        # Check if the class doesn't start on one day and end on the next
-        start_time = start_field[0]
-        end_time = start_time + int(allocation.duration) - 1
-        if start_time % 12 > end_time % 12:
-            ind += 1
-            continue
 
-        # Check if the new room is appropriate
-        if start_field[1] not in allocation.possible_classrooms:
-            ind += 1
-            continue
+    start_time, classroom_id = find_ideal_spot(matrix, data, allocation_index, free)
+    # Ideal spot not found
+    if start_time < 0:
+        return
 
-        # Check if the entire block can be used and for possible overlaps
-        found = True
-        for i in range(int(allocation.duration)):
-            field = (i + start_time, start_field[1])
-            if field not in free or not valid_teacher_group_row(matrix, data, allocation_index, field[0]):
-                found = False
-                ind += 1
-                break
+    move_allocation(matrix, data, allocation_index, start_time, classroom_id, free, filled,
+                    groups_empty_space, teachers_empty_space, journal)
 
-        if found:
-            # Remove current class from filled and add to free
-            filled.pop(allocation_index, None)
-            for f in fields:
-                free.append((f[0], f[1]))
-                matrix[f[0]][f[1]] = None
-                
-                # Remove empty space from class group at old position
-                class_group_id = allocation.class_group.id
-                if class_group_id in groups_empty_space and f[0] in groups_empty_space[class_group_id]:
-                    groups_empty_space[class_group_id].remove(f[0])
-                
-                # Remove empty space from teacher at old position
-                teacher_id = allocation.teacher.id
-                if teacher_id in teachers_empty_space and f[0] in teachers_empty_space[teacher_id]:
-                    teachers_empty_space[teacher_id].remove(f[0])
 
-            # Add empty space for the class group
-            class_group_id = allocation.class_group.id
-            
-            for i in range(int(allocation.duration)):
-                if class_group_id not in groups_empty_space:
-                    groups_empty_space[class_group_id] = []
-                groups_empty_space[class_group_id].append(i + start_time)
-
-            # Add new class time, remove slots from free and insert in matrix
-            for i in range(int(allocation.duration)):
-                filled.setdefault(allocation_index, []).append((i + start_time, start_field[1]))
-                free.remove((i + start_time, start_field[1]))
-                matrix[i + start_time][start_field[1]] = allocation_index
-                
-                # Add new empty space for the teacher
-                teacher_id = allocation.teacher.id
-                if teacher_id not in teachers_empty_space:
-                    teachers_empty_space[teacher_id] = []
-                teachers_empty_space[teacher_id].append(i + start_time)
-            break
+def undo(journal: List[Tuple[Callable, tuple]]):
+    """
+    Reverts the changes recorded by move_allocation, newest first,
+    and empties the journal.
+    
+    Args:
+        journal: (inverse, args) pairs filled by move_allocation
+    """
+    for inverse, args in reversed(journal):
+        inverse(*args)
+    journal.clear()
 
 
-def evolutionary_algorithm(matrix: List[List], data: TimetableData, 
-                         free: List[Tuple[int, int]], filled: Dict[int, List[Tuple[int, int]]], 
-                         groups_empty_space: Dict[int, List[int]], 
-                         teachers_empty_space: Dict[int, List[int]]):
+def evolutionary_algorithm(matrix: np.ndarray, data: TimetableData, 
+                         free: np.ndarray, filled: Dict[int, List[Tuple[int, int]]], 
+                         groups_empty_space: Dict[int, np.ndarray], 
+                         teachers_empty_space: Dict[int, np.ndarray],
+                         rng: Optional[np.random.Generator] = None):
     """
     Evolutionary algorithm that tries to find a timetable such that hard constraints are satisfied.
     Uses (1+1) evolutionary strategy with Schwefel's 1/5 success rule.
@@ -305,18 +491,23 @@ def evolutionary_algorithm(matrix: List[List], data: TimetableData,
     Args:
         matrix: Timetable matrix
         data: Timetable data
-        free: List of free slots
+        free: Boolean mask of free slots
         filled: Dictionary of filled allocations
         groups_empty_space: Empty spaces by class group
         teachers_empty_space: Empty spaces by teacher
+        rng: Random number generator, a fresh unseeded one if not given
     """
-    from app.utils.utils import show_timetable
+    if rng is None:
+        rng = np.random.default_rng()
     
     n = 3
     sigma = 2
     run_times = 5
     max_stagnation = 200
 
+    # Costs are tracked per row; only rows touched by a mutation are recalculated
+    hard_costs = HardConstraintsCost(matrix, data)
+
     for run in range(run_times):
         print(f'Run {run + 1}/{run_times} | σ = {sigma:.4f}')
 
@@ -326,8 +517,8 @@ def evolutionary_algorithm(matrix: List[List], data: TimetableData,
         while stagnation < max_stagnation:
 
             # Check if optimal solution was found
-            loss_before, cost_allocations, cost_teachers, cost_classrooms, cost_groups = hard_constraints_cost(matrix, data)
-            if loss_before == 0 and check_hard_constraints(matrix, data) == 0:
+            loss_before, cost_allocations, cost_teachers, cost_classrooms, cost_groups = hard_costs.totals(matrix)
+            if loss_before == 0 and check_hard_constraints(matrix, data, max_overlaps=0) == 0:
                 print('\n✓ Optimal solution found!\n')
                 show_timetable(matrix)
                 break
@@ -336,12 +527,35 @@ def evolutionary_algorithm(matrix: List[List], data: TimetableData,
             costs_list = sorted(cost_allocations.items(), key=itemgetter(1), reverse=True)
 
             # Mutation: try to improve worst allocations
-            for i in range(len(costs_list) // 4):
-                if random.uniform(0, 1) < sigma and costs_list[i][1] != 0:
-                    mutate_ideal_spot(matrix, data, costs_list[i][0], free, filled, groups_empty_space,
+            rolls = rng.random(len(costs_list) // 4).tolist()
+            selected = [
+                costs_list[i][0] for i in range(len(costs_list) // 4)
+                if rolls[i] < sigma and costs_list[i][1] != 0
+            ]
+
+            # Spots are searched in parallel on the same matrix, then moves are
+            # committed one by one. Once a move went in, a proposal it may have
+            # invalidated is checked again, and searched again serially if needed.
+            changed_rows = set()
+            spots = propose_ideal_spots(matrix, data, selected, free) if selected else []
+            for allocation_index, (start_time, classroom_id) in zip(selected, spots):
+                old_fields = filled.get(allocation_index)
+                if old_fields is None:
+                    continue
+                if start_time >= 0 and (not changed_rows or spot_available(
+                        matrix, data, allocation_index, free, start_time, classroom_id)):
+                    move_allocation(matrix, data, allocation_index, start_time, classroom_id,
+                                    free, filled, groups_empty_space, teachers_empty_space)
+                elif changed_rows:
+                    mutate_ideal_spot(matrix, data, allocation_index, free, filled, groups_empty_space,
                                       teachers_empty_space)
+                new_fields = filled.get(allocation_index)
+                if new_fields is not old_fields:
+                    changed_rows.update(field[0] for field in old_fields)
+                    changed_rows.update(field[0] for field in new_fields)
 
-            loss_after, _, _, _, _ = hard_constraints_cost(matrix, data)
+            hard_costs.update(matrix, changed_rows)
+            loss_after = hard_costs.total()
             if loss_after < loss_before:
                 stagnation = 0
                 cost_stats += 1
@@ -349,6 +563,13 @@ def evolutionary_algorithm(matrix: List[List], data: TimetableData,
                 stagnation += 1
 
             t += 1
+            # Every 50 iterations, check the tracked costs against a full scan of
+            # the matrix; like any assert, this is skipped under python -O
+            if __debug__ and t % 50 == 0:
+                overlaps = hard_costs.overlaps()
+                assert check_hard_constraints(matrix, data, max_overlaps=overlaps) == overlaps, \
+                    'Tracked hard constraint costs differ from the matrix'
+
             # Adapt σ for (1+1)-ES according to Schwefel's 1/5 success rule
             if t >= 10*n and t % n == 0:
                 s = cost_stats
@@ -365,10 +586,11 @@ def evolutionary_algorithm(matrix: List[List], data: TimetableData,
         print(f'  - Classrooms: {cost_classrooms}\n')
 
 
-def simulated_hardening(matrix: List[List], data: TimetableData, 
-                       free: List[Tuple[int, int]], filled: Dict[int, List[Tuple[int, int]]], 
-                       groups_empty_space: Dict[int, List[int]], 
-                       teachers_empty_space: Dict[int, List[int]], file: str):
+def simulated_hardening(matrix: np.ndarray, data: TimetableData, 
+                       free: np.ndarray, filled: Dict[int, List[Tuple[int, int]]], 
+                       groups_empty_space: Dict[int, np.ndarray], 
+                       teachers_empty_space: Dict[int, np.ndarray], file: str,
+                       rng: Optional[np.random.Generator] = None):
     """
     Algorithm that uses simulated annealing with geometric temperature decrease to
     optimize the timetable satisfying soft constraints as much as possible
@@ -377,54 +599,77 @@ def simulated_hardening(matrix: List[List], data: TimetableData,
     Args:
         matrix: Timetable matrix
         data: Timetable data
-        free: List of free slots
+        free: Boolean mask of free slots
         filled: Dictionary of filled allocations
         groups_empty_space: Empty spaces by class group
         teachers_empty_space: Empty spaces by teacher
         file: Output file name
+        rng: Random number generator, a fresh unseeded one if not given
     """
-    from app.utils.utils import show_timetable, show_statistics
+    if rng is None:
+        rng = np.random.default_rng()
     
     # Number of iterations
     iter_count = 2500
     # Temperature
     t = 0.5
-    _, _, curr_cost_group = empty_space_groups_cost(groups_empty_space)
-    _, _, curr_cost_teachers = empty_space_teachers_cost(teachers_empty_space)
+    # Costs are kept per class group and teacher, a mutation only recalculates
+    # the owners of the allocations it moved
+    group_costs = EmptySpaceCost(groups_empty_space)
+    teacher_costs = EmptySpaceCost(teachers_empty_space)
+    allocation_group_ids = data.class_group_ids[data.allocation_class_group].tolist()
+    allocation_teacher_ids = data.teacher_ids[data.allocation_teacher].tolist()
+    _, _, curr_cost_group = group_costs.totals()
+    _, _, curr_cost_teachers = teacher_costs.totals()
     curr_cost = curr_cost_group  # + curr_cost_teachers
 
+    # Draw every acceptance roll and every allocation to mutate up front
+    num_allocations = len(data.class_allocations)
+    rt_array = rng.random(iter_count).tolist()
+    pick_array = rng.integers(0, max(num_allocations, 1), size=(iter_count, num_allocations // 4))
+    # Geometric temperature decrease, iteration i runs at t * 0.99 ** (i + 1)
+    inverse_temperatures = (1 / (t * 0.99 ** np.arange(1, iter_count + 1))).tolist()
+
     for i in range(iter_count):
-        rt = random.uniform(0, 1)
-        t *= 0.99  # Geometric temperature decrease
+        rt = rt_array[i]
 
-        # Save current results
-        old_matrix = copy.deepcopy(matrix)
-        old_free = copy.deepcopy(free)
-        old_filled = copy.deepcopy(filled)
-        old_groups_empty_space = copy.deepcopy(groups_empty_space)
-        old_teachers_empty_space = copy.deepcopy(teachers_empty_space)
+        # Save current results: the arrays are copied, the changes to filled
+        # and the empty spaces are recorded so they can be rolled back
+        old_matrix = matrix.copy()
+        old_free = free.copy()
+        old_group_costs = group_costs.snapshot()
+        old_teacher_costs = teacher_costs.snapshot()
+        journal = []
 
         # Try to mutate 1/4 of all allocations
-        num_allocations = len(data.class_allocations)
-        for j in range(num_allocations // 4):
-            allocation_index = random.randrange(num_allocations)
+        picked = pick_array[i].tolist()
+        for allocation_index in picked:
             mutate_ideal_spot(matrix, data, allocation_index, free, filled, groups_empty_space, 
-                            teachers_empty_space)
-        
-        _, _, new_cost_groups = empty_space_groups_cost(groups_empty_space)
-        _, _, new_cost_teachers = empty_space_teachers_cost(teachers_empty_space)
+                            teachers_empty_space, journal)
+        changed_groups = {allocation_group_ids[index] for index in picked}
+        changed_teachers = {allocation_teacher_ids[index] for index in picked}
+
+        group_costs.update(changed_groups)
+        teacher_costs.update(changed_teachers)
+        _, _, new_cost_groups = group_costs.totals()
+        _, _, new_cost_teachers = teacher_costs.totals()
         new_cost = new_cost_groups  # + new_cost_teachers
 
-        if new_cost < curr_cost or rt <= math.exp((curr_cost - new_cost) / t):
+        if new_cost < curr_cost:
+            accept = True
+        else:
+            accept = rt <= math.exp((curr_cost - new_cost) * inverse_temperatures[i])
+
+        if accept:
             # Accept new cost and continue with new data
             curr_cost = new_cost
         else:
-            # Return to previously saved data
-            matrix = copy.deepcopy(old_matrix)
-            free = copy.deepcopy(old_free)
-            filled = copy.deepcopy(old_filled)
-            groups_empty_space = copy.deepcopy(old_groups_empty_space)
-            teachers_empty_space = copy.deepcopy(old_teachers_empty_space)
+            # Return to previously saved data, in place so callers keep their references
+            matrix[:] = old_matrix
+            free[:] = old_free
+            undo(journal)
+            group_costs.restore(old_group_costs)
+            teacher_costs.restore(old_teacher_costs)
         
         if i % 100 == 0:
             print(f'Iteration: {i:4d} | Average cost: {curr_cost:0.8f}')
@@ -440,36 +685,34 @@ def simulated_hardening(matrix: List[List], data: TimetableData,
     show_statistics(matrix, data, groups_empty_space, teachers_empty_space)
 
 
-def optimize_timetable(timetable_data: TimetableData, output_file: str = 'timetable_solution.txt') -> Dict:
+def optimize_timetable(timetable_data: TimetableData, output_file: str = 'timetable_solution.txt',
+                       seed: Optional[int] = None) -> Dict:
     """
     Main function to optimize the timetable using genetic algorithm.
     
     Args:
         timetable_data: Timetable data loaded from database
         output_file: Output file name to save the solution
+        seed: Seed for the random number generator, for reproducible runs
         
     Returns:
         Dict containing the timetable matrix and statistics
         
     Data structure:
-    - matrix: Matrix [time][room] = allocation_index or None
-    - free: List of free slots [(time, room), ...]
+    - matrix: int32 matrix [time][room] = allocation_index, -1 for free slots
+    - free: Boolean mask [time][room], True where the slot is free
     - filled: Dict {allocation_index: [(time, room), ...]}
-    - groups_empty_space: Dict {class_group_id: [times]}
-    - teachers_empty_space: Dict {teacher_id: [times]}
+    - groups_empty_space: Dict {class_group_id: [row] = classes at that row}
+    - teachers_empty_space: Dict {teacher_id: [row] = classes at that row}
     """
-    from app.utils.utils import (
-        load_data_from_database,
-        set_up,
-        show_statistics
-    )
-    
     # Initialize auxiliary structures
+    rng = np.random.default_rng(seed)
     filled = {}
     groups_empty_space = {}
     teachers_empty_space = {}
 
-    # Process database data
+    # Process database data; this creates the empty-space entry of every class
+    # group and teacher, so the solver never has to check for missing keys
     print("Loading data from database...")
     data = load_data_from_database(timetable_data, teachers_empty_space, groups_empty_space)
     
@@ -477,6 +720,31 @@ def optimize_timetable(timetable_data: TimetableData, output_file: str = 'timeta
     print(f"Setting up matrix with {len(data.classrooms)} classrooms...")
     matrix, free = set_up(len(data.classrooms))
     
+    # Resolve the schedule of every row once instead of on each availability check
+    row_schedules = [map_row_to_schedule(row, data.schedules) for row in range(len(matrix))]
+    data.row_to_schedule = np.array(
+        [-1 if schedule_id is None else schedule_id for schedule_id in row_schedules],
+        dtype=np.int32,
+    )
+    
+    # Rows where a class of each duration can start without running into the next day
+    rows = np.arange(len(matrix))
+    durations = np.arange(data.allocation_duration.max(initial=0) + 1)[:, None]
+    data.valid_start_rows = rows % 12 <= (rows + durations - 1) % 12
+    
+    # Rooms each allocation may use, as a mask over the matrix columns
+    data.allocation_room_ok = np.zeros((len(data.class_allocations), len(data.classrooms)), dtype=np.bool_)
+    for index, allocation in data.class_allocations.items():
+        data.allocation_room_ok[index, allocation.possible_classrooms] = True
+    
+    # Teacher availability per row; teachers without restrictions may teach at any time
+    data.teacher_row_allowed = np.ones((len(data.teacher_ids), len(matrix)), dtype=np.bool_)
+    for teacher_id, available_schedule_ids in (data.teacher_schedules or {}).items():
+        if available_schedule_ids and teacher_id in data.teacher_index:
+            data.teacher_row_allowed[data.teacher_index[teacher_id]] = np.isin(
+                data.row_to_schedule, available_schedule_ids
+            )
+    
     # Generate initial population
     print("Generating initial population...")
     initial_population(data, matrix, free, filled, groups_empty_space, teachers_empty_space)
@@ -487,19 +755,21 @@ def optimize_timetable(timetable_data: TimetableData, output_file: str = 'timeta
 
     # Run evolutionary algorithm
     print("Running evolutionary algorithm...")
-    evolutionary_algorithm(matrix, data, free, filled, groups_empty_space, teachers_empty_space)
+    evolutionary_algorithm(matrix, data, free, filled, groups_empty_space, teachers_empty_space, rng)
     
     # Display statistics
     print('\n' + '='*60)
     print('STATISTICS AFTER EVOLUTIONARY ALGORITHM')
     print('='*60)
-    show_statistics(matrix, data, groups_empty_space, teachers_empty_space)
+    # The algorithm already printed its final cost, only feasibility is checked here
+    show_statistics(matrix, data, groups_empty_space, teachers_empty_space, max_overlaps=0)
     
     # Apply simulated annealing for additional optimization
     print('\n' + '='*60)
     print('Applying simulated annealing...')
     print('='*60)
-    simulated_hardening(matrix, data, free, filled, groups_empty_space, teachers_empty_space, output_file)
+    simulated_hardening(matrix, data, free, filled, groups_empty_space, teachers_empty_space, output_file,
+                        rng)
     
     return {
         'matrix': matrix,
@@ -1,77 +1,369 @@
-def empty_space_groups_cost(groups_empty_space):
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.models.schedule import Schedule
+from app.utils.jit import NUMBA_AVAILABLE, njit
+
+
+@njit("void(int32[::1], int64[::1], int64[::1], int64[::1])", cache=True, fastmath=True)
+def _empty_space_kernel(times, offsets, owner_cost, owner_max):
     """
-    Calculates total empty space of all groups for week, maximum empty space in day and average empty space for whole
-    week per group.
-    :param groups_empty_space: dictionary where key = group index, values = list of rows where it is in
-    :return: total cost, maximum per day, average cost
+    Sums the empty space between classes of every owner (class group or teacher).
+    
+    Args:
+        times: Sorted rows of all owners, concatenated owner after owner
+        offsets: Start of each owner's rows in times, plus the total length at the end
+        owner_cost: [owner] = total empty space of the owner, filled in
+        owner_max: [owner] = maximum empty space of the owner in one day, filled in
     """
-    # total empty space of all groups for the whole week
-    cost = 0
-    # max empty space in one day for some group
-    max_empty = 0
+    empty_per_day = np.zeros(5, dtype=np.int64)
 
-    for group_index, times in groups_empty_space.items():
-        times.sort()
-        # empty space for each day for current group
-        empty_per_day = {0: 0, 1: 0, 2: 0, 3: 0, 4: 0}
+    for owner in range(offsets.shape[0] - 1):
+        start = offsets[owner]
+        end = offsets[owner + 1]
+        owner_cost[owner] = 0
+        owner_max[owner] = 0
+        if end - start < 3:
+            continue  # the scan below compares no rows
+        empty_per_day[:] = 0
 
-        for i in range(1, len(times) - 1):
-            a = times[i-1]
+        # Day of the previous row, carried over so every row is divided once
+        cost = 0
+        day_a = times[start] // 12
+        for i in range(start + 1, end - 1):
+            a = times[i - 1]
             b = times[i]
+            day_b = b // 12
             diff = b - a
             # classes are in the same day if their time div 12 is the same
-            if a // 12 == b // 12 and diff > 1:
-                empty_per_day[a // 12] += diff - 1
+            if day_a == day_b and diff > 1:
+                empty_per_day[day_a] += diff - 1
                 cost += diff - 1
+            day_a = day_b
+
+        owner_cost[owner] = cost
+        for day in range(5):
+            if owner_max[owner] < empty_per_day[day]:
+                owner_max[owner] = empty_per_day[day]
+
+
+def _empty_space_numpy(times, offsets, owner_cost, owner_max):
+    """
+    Vectorized NumPy version of _empty_space_kernel, used when numba is not
+    installed and the kernel would run as plain Python.
+    
+    Args:
+        times: Sorted rows of all owners, concatenated owner after owner
+        offsets: Start of each owner's rows in times, plus the total length at the end
+        owner_cost: [owner] = total empty space of the owner, filled in
+        owner_max: [owner] = maximum empty space of the owner in one day, filled in
+    """
+    owners = len(offsets) - 1
+    owner_cost[:] = 0
+    owner_max[:] = 0
+    if len(times) < 2:
+        return
+
+    # Pair p compares times[p] and times[p + 1]; like the kernel, the pairs of
+    # an owner run from its first row up to, but not including, its last pair
+    a = times[:-1].astype(np.int64)
+    b = times[1:].astype(np.int64)
+    pair_owner = np.repeat(np.arange(owners), np.diff(offsets))[:-1]
+    pair_index = np.arange(len(a))
+    in_owner = pair_index + 2 < offsets[1:][pair_owner]
+
+    # classes are in the same day if their time div 12 is the same
+    diff = b - a
+    day = a // 12
+    gap = in_owner & (day == b // 12) & (diff > 1)
+
+    empty = diff[gap] - 1
+    owner_cost[:] = np.bincount(pair_owner[gap], weights=empty, minlength=owners)
+    per_owner_day = np.bincount(pair_owner[gap] * 5 + day[gap], weights=empty,
+                                minlength=owners * 5)
+    owner_max[:] = per_owner_day.reshape(owners, 5).max(axis=1)
 
-        # compare current max with empty spaces per day for current group
-        for key, value in empty_per_day.items():
-            if max_empty < value:
-                max_empty = value
 
-    # Avoid division by zero when there are no class groups
-    if len(groups_empty_space) == 0:
+def _flatten_empty_space(bags):
+    """
+    Flattens empty-space histograms into the arrays consumed by _empty_space_kernel.
+    
+    Args:
+        bags: List of histograms, one per owner, [row] = classes at that row
+        
+    Returns:
+        times, offsets (see _empty_space_kernel)
+    """
+    if not bags:
+        return np.zeros(0, dtype=np.int32), np.zeros(1, dtype=np.int64)
+
+    # Every row is repeated once per class, so the kernel counts every class,
+    # and comes out sorted within each owner
+    counts = np.array(bags, dtype=np.int64)
+    rows = np.broadcast_to(np.arange(counts.shape[1], dtype=np.int32), counts.shape)
+    flat_times = np.repeat(rows.ravel(), counts.ravel())
+    offsets = np.zeros(len(bags) + 1, dtype=np.int64)
+    np.cumsum(counts.sum(axis=1), out=offsets[1:])
+    return flat_times, offsets
+
+
+def _empty_space_owner_costs(bags):
+    """
+    Args:
+        bags: List of histograms, one per owner, [row] = classes at that row
+        
+    Returns:
+        owner_cost, owner_max: int64 arrays with the total empty space of every
+        owner and its maximum empty space in one day
+    """
+    flat_times, offsets = _flatten_empty_space(bags)
+    owner_cost = np.empty(len(bags), dtype=np.int64)
+    owner_max = np.empty(len(bags), dtype=np.int64)
+    if NUMBA_AVAILABLE:
+        _empty_space_kernel(flat_times, offsets, owner_cost, owner_max)
+    else:
+        _empty_space_numpy(flat_times, offsets, owner_cost, owner_max)
+    return owner_cost, owner_max
+
+
+def _empty_space_cost(empty_space):
+    """
+    Calculates the empty space cost of {owner: histogram of rows}.
+    
+    Args:
+        empty_space: Dictionary where key = owner, values = histogram, [row] = classes it has at that row
+        
+    Returns:
+        total cost, maximum per day, average cost
+    """
+    # Avoid division by zero when there are no owners
+    if len(empty_space) == 0:
         return 0, 0, 0.0
+
+    owner_cost, owner_max = _empty_space_owner_costs(list(empty_space.values()))
+    cost = int(owner_cost.sum())
+    return cost, int(owner_max.max()), cost / len(empty_space)
+
+
+class EmptySpaceCost:
+    """
+    Empty space cost of every owner (class group or teacher), kept per owner so
+    that a mutation only has to recalculate the owners it touched.
+    
+    Each owner's cost depends on its own histogram of rows only. The owners are
+    the keys of empty_space when the tracker is created.
     
-    return cost, max_empty, cost / len(groups_empty_space)
+    Args:
+        empty_space: Dictionary where key = owner, values = histogram, [row] = classes it has at that row
+    """
+
+    def __init__(self, empty_space):
+        self.empty_space = empty_space
+        self.owner_index = {owner: i for i, owner in enumerate(empty_space)}
+        self.owner_cost, self.owner_max = _empty_space_owner_costs(list(empty_space.values()))
+
+    def update(self, owners):
+        """
+        Recalculates the costs of owners whose rows changed since the last update.
+        
+        Args:
+            owners: Iterable of changed owners
+        """
+        owners = list(owners)
+        if owners:
+            indices = [self.owner_index[owner] for owner in owners]
+            self.owner_cost[indices], self.owner_max[indices] = \
+                _empty_space_owner_costs([self.empty_space[owner] for owner in owners])
+
+    def snapshot(self):
+        """
+        Returns:
+            Copy of the per-owner costs, to be given back to restore
+        """
+        return self.owner_cost.copy(), self.owner_max.copy()
+
+    def restore(self, snapshot):
+        """
+        Rolls the per-owner costs back to a snapshot, after the empty spaces
+        themselves were rolled back.
+        
+        Args:
+            snapshot: Value returned by snapshot
+        """
+        self.owner_cost[:], self.owner_max[:] = snapshot
+
+    def totals(self):
+        """
+        Returns:
+            total cost, maximum per day, average cost (as empty_space_groups_cost)
+        """
+        if len(self.owner_cost) == 0:
+            return 0, 0, 0.0
+        cost = int(self.owner_cost.sum())
+        return cost, int(self.owner_max.max()), cost / len(self.owner_cost)
+
+
+def empty_space_groups_cost(groups_empty_space):
+    """
+    Calculates total empty space of all groups for week, maximum empty space in day and average empty space for whole
+    week per group.
+    :param groups_empty_space: dictionary where key = group index, values = histogram, [row] = classes it has at that row
+    :return: total cost, maximum per day, average cost
+    """
+    return _empty_space_cost(groups_empty_space)
 
 
 def empty_space_teachers_cost(teachers_empty_space):
     """
     Calculates total empty space of all teachers for week, maximum empty space in day and average empty space for whole
     week per teacher.
-    :param teachers_empty_space: dictionary where key = name of the teacher, values = list of rows where it is in
+    :param teachers_empty_space: dictionary where key = name of the teacher, values = histogram, [row] = classes it has at that row
     :return: total cost, maximum per day, average cost
     """
-    # total empty space of all teachers for the whole week
-    cost = 0
-    # max empty space in one day for some teacher
-    max_empty = 0
+    return _empty_space_cost(teachers_empty_space)
 
-    for teacher_name, times in teachers_empty_space.items():
-        times.sort()
-        # empty space for each day for current teacher
-        empty_per_day = {0: 0, 1: 0, 2: 0, 3: 0, 4: 0}
 
-        for i in range(1, len(times) - 1):
-            a = times[i - 1]
-            b = times[i]
-            diff = b - a
-            # classes are in the same day if their time div 12 is the same
-            if a // 12 == b // 12 and diff > 1:
-                empty_per_day[a // 12] += diff - 1
-                cost += diff - 1
+@njit("void(int32[:, ::1], int64[::1], int32[::1], int32[::1], boolean[:, ::1], "
+      "boolean[:, ::1], int64[:, ::1], int64[:, ::1])",
+      cache=True, fastmath=True)
+def _hard_costs_rows_kernel(matrix, rows, alloc_teacher, alloc_group, room_ok, row_ok,
+                            cell_cost, row_cost):
+    """
+    Recalculates the hard constraint costs of the given matrix rows in place.
+    
+    Each conflicting pair of slots in a row is counted once, against the
+    allocation in the leftmost room. Conflicts are counted per teacher and
+    per class group, so a row costs O(rooms) instead of O(rooms ** 2).
+    
+    Args:
+        matrix: Timetable matrix [time][room] = allocation_index, -1 for free slots
+        rows: Rows to recalculate
+        alloc_teacher: Teacher index of each allocation
+        alloc_group: Class group index of each allocation
+        room_ok: [allocation][room] = room has the space_type the allocation requires
+        row_ok: [teacher][time] = teacher is available at that time
+        cell_cost: [time][room] = cost charged to the allocation in that slot, updated
+        row_cost: [time] = (cost_teacher, cost_classrooms, cost_group,
+                  cost_teacher_availability) of that row, updated
+    """
+    cols = matrix.shape[1]
 
-        # compare current max with empty spaces per day for current teacher
-        for key, value in empty_per_day.items():
-            if max_empty < value:
-                max_empty = value
+    # Slots already seen in the current row, per teacher and per class group
+    teacher_seen = np.zeros(alloc_teacher.max() + 1 if len(alloc_teacher) else 0, dtype=np.int64)
+    group_seen = np.zeros(alloc_group.max() + 1 if len(alloc_group) else 0, dtype=np.int64)
 
-    # Avoid division by zero when there are no teachers
-    if len(teachers_empty_space) == 0:
-        return 0, 0, 0.0
+    for i in rows:
+        row_cost[i, :] = 0
+        cell_cost[i, :] = 0
+
+        # Scan right to left, so the slots seen so far are the ones in later
+        # rooms that the current slot conflicts with
+        for j in range(cols - 1, -1, -1):
+            field = matrix[i, j]  # For each slot in the matrix
+            if field < 0:
+                continue
+
+            # Calculate cost for classroom (check if space_type is compatible)
+            if not room_ok[field, j]:
+                row_cost[i, 1] += 1
+                cell_cost[i, j] += 1
+
+            # Calculate cost for teacher availability (SCHEDULE_TEACHER)
+            teacher = alloc_teacher[field]
+            if not row_ok[teacher, i]:
+                row_cost[i, 3] += 1
+                cell_cost[i, j] += 1
+
+            # Calculate cost for teachers (same teacher, same time)
+            row_cost[i, 0] += teacher_seen[teacher]
+            cell_cost[i, j] += teacher_seen[teacher]
+            teacher_seen[teacher] += 1
+
+            # Calculate cost for class groups (same group, same time)
+            group = alloc_group[field]
+            row_cost[i, 2] += group_seen[group]
+            cell_cost[i, j] += group_seen[group]
+            group_seen[group] += 1
+
+        for j in range(cols):
+            field = matrix[i, j]
+            if field >= 0:
+                teacher_seen[alloc_teacher[field]] = 0
+                group_seen[alloc_group[field]] = 0
+
+
+class HardConstraintsCost:
+    """
+    Hard constraint costs of a timetable, kept per row so that a mutation only
+    has to recalculate the rows it touched.
+    
+    Every cost term depends on a single row of the matrix: the room and
+    availability of each slot, and the conflicts between slots at the same time.
     
-    return cost, max_empty, cost / len(teachers_empty_space)
+    Args:
+        matrix: Timetable matrix [time][room] = allocation_index, -1 for free slots
+        data: Timetable data (TimetableData)
+    """
+
+    def __init__(self, matrix, data):
+        self.data = data
+        _, self.alloc_teacher, self.alloc_group, self.room_ok, self.row_ok = \
+            _hard_constraint_arrays(matrix, data)
+        self.cell_cost = np.zeros(matrix.shape, dtype=np.int64)
+        self.row_cost = np.zeros((matrix.shape[0], 4), dtype=np.int64)
+        self.update(matrix, range(matrix.shape[0]))
+
+    def update(self, matrix, rows):
+        """
+        Recalculates the costs of rows that changed since the last update.
+        
+        Args:
+            matrix: Timetable matrix
+            rows: Iterable of changed rows
+        """
+        rows = np.fromiter(rows, dtype=np.int64)
+        if len(rows):
+            _hard_costs_rows_kernel(np.ascontiguousarray(matrix, dtype=np.int32), rows,
+                                    self.alloc_teacher, self.alloc_group, self.room_ok,
+                                    self.row_ok, self.cell_cost, self.row_cost)
+
+    def total(self):
+        """
+        Returns:
+            total_cost
+        """
+        return int(self.row_cost.sum())
+
+    def overlaps(self):
+        """
+        Returns:
+            overlaps: Same count as check_hard_constraints, where every
+                      conflicting pair of slots counts from both sides
+        """
+        cost_teacher, cost_classrooms, cost_group, cost_teacher_availability = \
+            self.row_cost.sum(axis=0).tolist()
+        return cost_classrooms + cost_teacher_availability + 2 * (cost_teacher + cost_group)
+
+    def totals(self, matrix):
+        """
+        Args:
+            matrix: Timetable matrix, as of the last update
+            
+        Returns:
+            total_cost, cost_allocation, cost_teacher, cost_classrooms, cost_group
+        """
+        cost_teacher, cost_classrooms, cost_group, cost_teacher_availability = \
+            self.row_cost.sum(axis=0).tolist()
+
+        # cost_allocation: dictionary where key = allocation index, value = total cost
+        occupied = matrix >= 0
+        costs = np.bincount(matrix[occupied], weights=self.cell_cost[occupied],
+                            minlength=len(self.data.class_allocations))
+        cost_allocation = dict(zip(self.data.class_allocations, costs.astype(np.int64).tolist()))
+
+        total_cost = cost_teacher + cost_classrooms + cost_group + cost_teacher_availability
+        return total_cost, cost_allocation, cost_teacher, cost_classrooms, cost_group
 
 
 def hard_constraints_cost(matrix, data):
@@ -86,69 +378,192 @@ def hard_constraints_cost(matrix, data):
     For everything that doesn't satisfy these constraints, one is added to the cost.
     
     Args:
-        matrix: Timetable matrix [time][room] = allocation_index
+        matrix: Timetable matrix [time][room] = allocation_index, -1 for free slots
         data: Timetable data (TimetableData)
         
     Returns:
         total_cost, cost_allocation, cost_teacher, cost_classrooms, cost_group
     """
-    from app.models.timetable_data import TimetableData
-    from app.services.optimizer import map_row_to_schedule
-    
-    # cost_allocation: dictionary where key = allocation index, value = total cost
-    cost_allocation = {}
-    for allocation_idx in data.class_allocations:
-        cost_allocation[allocation_idx] = 0
-
-    cost_classrooms = 0
-    cost_teacher = 0
-    cost_group = 0
-    cost_teacher_availability = 0
-    
-    for i in range(len(matrix)):
-        for j in range(len(matrix[i])):
-            field = matrix[i][j]  # For each slot in the matrix
-            if field is not None:
-                allocation1 = data.class_allocations[field]
-
-                # Calculate cost for classroom (check if space_type is compatible)
-                classroom_id = j
-                if classroom_id not in allocation1.possible_classrooms:
-                    cost_classrooms += 1
-                    cost_allocation[field] += 1
-
-                # Calculate cost for teacher availability (SCHEDULE_TEACHER)
-                if data.teacher_schedules is not None:
-                    teacher_id = allocation1.teacher.id
-                    if teacher_id in data.teacher_schedules:
-                        available_schedule_ids = data.teacher_schedules[teacher_id]
-                        if available_schedule_ids:  # If there are defined restrictions
-                            schedule_id = map_row_to_schedule(i, data.schedules)
-                            if schedule_id is None or schedule_id not in available_schedule_ids:
-                                cost_teacher_availability += 1
-                                cost_allocation[field] += 1
-
-                # Check conflicts with other allocations at the same time
-                for k in range(j + 1, len(matrix[i])):
-                    next_field = matrix[i][k]
-                    if next_field is not None:
-                        allocation2 = data.class_allocations[next_field]
-
-                        # Calculate cost for teachers (same teacher, same time)
-                        if allocation1.teacher.id == allocation2.teacher.id:
-                            cost_teacher += 1
-                            cost_allocation[field] += 1
-
-                        # Calculate cost for class groups (same group, same time)
-                        if allocation1.class_group.id == allocation2.class_group.id:
-                            cost_group += 1
-                            cost_allocation[field] += 1
-
-    total_cost = cost_teacher + cost_classrooms + cost_group + cost_teacher_availability
-    return total_cost, cost_allocation, cost_teacher, cost_classrooms, cost_group
-
-
-def check_hard_constraints(matrix, data):
+    return evaluate_hard(matrix, data, breakdown=True)[1:]
+
+
+@njit("int64(int32[:, ::1], int32[::1], int32[::1], boolean[:, ::1], boolean[:, ::1], "
+      "int64)",
+      cache=True, fastmath=True)
+def _overlaps_kernel(matrix, alloc_teacher, alloc_group, room_ok, row_ok, max_overlaps):
+    """
+    Counts hard constraint overlaps of a timetable matrix.
+    
+    Same rules as _hard_costs_rows_kernel, without attributing the costs to
+    rows and cells; every conflicting pair of slots counts from both sides.
+    
+    Args:
+        matrix: Timetable matrix [time][room] = allocation_index, -1 for free slots
+        alloc_teacher: Teacher index of each allocation
+        alloc_group: Class group index of each allocation
+        room_ok: [allocation][room] = room has the space_type the allocation requires
+        row_ok: [teacher][time] = teacher is available at that time
+        max_overlaps: Stop after the first row that takes the count above this
+                      bound, -1 to always count every overlap
+        
+    Returns:
+        overlaps: Total number of overlaps/conflicts, or a partial count above
+                  max_overlaps
+    """
+    overlaps = 0
+    rows, cols = matrix.shape
+
+    # Slots already seen in the current row, per teacher and per class group
+    teacher_seen = np.zeros(alloc_teacher.max() + 1 if len(alloc_teacher) else 0, dtype=np.int64)
+    group_seen = np.zeros(alloc_group.max() + 1 if len(alloc_group) else 0, dtype=np.int64)
+
+    for i in range(rows):
+        for j in range(cols):
+            field = matrix[i, j]  # For each slot in the matrix
+            if field < 0:
+                continue
+
+            # Calculate cost for classroom (incompatible space_type)
+            if not room_ok[field, j]:
+                overlaps += 1
+
+            # Check teacher availability (SCHEDULE_TEACHER)
+            teacher = alloc_teacher[field]
+            if not row_ok[teacher, i]:
+                overlaps += 1
+
+            # Pairs with the slots seen before, counted for both slots
+            group = alloc_group[field]
+            overlaps += 2 * (teacher_seen[teacher] + group_seen[group])
+            teacher_seen[teacher] += 1
+            group_seen[group] += 1
+
+        for j in range(cols):
+            field = matrix[i, j]
+            if field >= 0:
+                teacher_seen[alloc_teacher[field]] = 0
+                group_seen[alloc_group[field]] = 0
+
+        if 0 <= max_overlaps < overlaps:
+            return overlaps
+
+    return overlaps
+
+
+def map_row_to_schedule(row: int, schedules: Dict[int, Schedule]) -> Optional[int]:
+    """
+    Maps a matrix row (time slot) to a Schedule ID.
+    
+    The matrix uses indices 0-59 representing:
+    - 0-11: Monday (7am-6pm)
+    - 12-23: Tuesday (7am-6pm)
+    - 24-35: Wednesday (7am-6pm)
+    - 36-47: Thursday (7am-6pm)
+    - 48-59: Friday (7am-6pm)
+    
+    Args:
+        row: Matrix row (0-59)
+        schedules: Dictionary of schedules {id: Schedule}
+        
+    Returns:
+        Corresponding schedule_id or None if not found
+    """
+    if not schedules:
+        return None
+    
+    # Map index to weekday and hour
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+    day_index = row // 12
+    hour_index = row % 12
+    
+    if day_index >= len(days):
+        return None
+        
+    weekday = days[day_index]
+    # Assuming schedules starting at 7am
+    hour = 7 + hour_index
+    start_time = f"{hour:02d}:00"
+    
+    # Search for corresponding schedule
+    for schedule_id, schedule in schedules.items():
+        if (schedule.weekday == weekday and 
+            schedule.start_time.startswith(f"{hour:02d}:")):
+            return schedule_id
+    
+    return None
+
+
+def _hard_constraint_arrays(matrix, data):
+    """
+    Converts the timetable matrix and data into the arrays used by the kernels.
+    
+    Args:
+        matrix: Timetable matrix [time][room] = allocation_index, -1 for free slots
+        data: Timetable data (TimetableData)
+        
+    Returns:
+        matrix, alloc_teacher, alloc_group, room_ok, row_ok (see _overlaps_kernel)
+    """
+    num_rows, num_rooms = matrix.shape
+    num_allocations = len(data.class_allocations)
+
+    dense_matrix = np.ascontiguousarray(matrix, dtype=np.int32)
+
+    if data.allocation_room_ok is not None:
+        room_ok = data.allocation_room_ok
+    else:
+        room_ok = np.zeros((num_allocations, num_rooms), dtype=np.bool_)
+        for idx, allocation in data.class_allocations.items():
+            room_ok[idx, allocation.possible_classrooms] = True
+
+    if data.teacher_row_allowed is not None:
+        row_ok = data.teacher_row_allowed
+    else:
+        row_ok = np.ones((len(data.teacher_ids), num_rows), dtype=np.bool_)
+        if data.row_to_schedule is not None:
+            row_schedule = data.row_to_schedule
+        else:
+            # Schedule of every row, mapped once; -1 where no schedule matches
+            row_schedule = np.full(num_rows, -1, dtype=np.int32)
+            for i in range(num_rows):
+                schedule_id = map_row_to_schedule(i, data.schedules)
+                if schedule_id is not None:
+                    row_schedule[i] = schedule_id
+
+        # Availability per row of each teacher with defined restrictions,
+        # shared by all their allocations
+        for teacher_id, available_schedule_ids in (data.teacher_schedules or {}).items():
+            if available_schedule_ids and teacher_id in data.teacher_index:
+                row_ok[data.teacher_index[teacher_id]] = np.isin(row_schedule, list(available_schedule_ids))
+
+    return dense_matrix, data.allocation_teacher, data.allocation_class_group, room_ok, row_ok
+
+
+def evaluate_hard(matrix, data, breakdown=False, max_overlaps=None):
+    """
+    Evaluates the hard constraints of a timetable in a single pass over the matrix.
+    
+    Args:
+        matrix: Timetable matrix
+        data: Timetable data (TimetableData)
+        breakdown: Also return the costs per constraint and per allocation
+        max_overlaps: Optional bound, only used without breakdown; once the count
+                      goes above it the scan stops early and a partial count
+                      (still above the bound) is returned
+        
+    Returns:
+        overlaps without breakdown, otherwise (overlaps, total_cost, cost_allocation,
+        cost_teacher, cost_classrooms, cost_group) as in hard_constraints_cost
+    """
+    if breakdown:
+        costs = HardConstraintsCost(matrix, data)
+        return (costs.overlaps(),) + costs.totals(matrix)
+
+    bound = -1 if max_overlaps is None else max_overlaps
+    return int(_overlaps_kernel(*_hard_constraint_arrays(matrix, data), bound))
+
+
+def check_hard_constraints(matrix, data, max_overlaps=None):
     """
     Checks if all hard constraints are satisfied and returns the number of
     overlaps with classes, rooms, teachers, class groups and availability.
@@ -156,47 +571,32 @@ def check_hard_constraints(matrix, data):
     Args:
         matrix: Timetable matrix
         data: Timetable data (TimetableData)
+        max_overlaps: Optional bound; once the count goes above it the scan stops
+                      early and a partial count (still above the bound) is returned
         
     Returns:
         overlaps: Total number of overlaps/conflicts
     """
-    from app.models.timetable_data import TimetableData
-    from app.services.optimizer import map_row_to_schedule
+    return evaluate_hard(matrix, data, max_overlaps=max_overlaps)
+
+
+def warmup():
+    """
+    Runs every cost kernel once on tiny dummy inputs.
     
-    overlaps = 0
-    for i in range(len(matrix)):
-        for j in range(len(matrix[i])):
-            field = matrix[i][j]  # For each slot in the matrix
-            if field is not None:
-                allocation1 = data.class_allocations[field]
-
-                # Calculate cost for classroom (incompatible space_type)
-                if j not in allocation1.possible_classrooms:
-                    overlaps += 1
-
-                # Check teacher availability (SCHEDULE_TEACHER)
-                if data.teacher_schedules is not None:
-                    teacher_id = allocation1.teacher.id
-                    if teacher_id in data.teacher_schedules:
-                        available_schedule_ids = data.teacher_schedules[teacher_id]
-                        if available_schedule_ids:  # If there are defined restrictions
-                            schedule_id = map_row_to_schedule(i, data.schedules)
-                            if schedule_id is None or schedule_id not in available_schedule_ids:
-                                overlaps += 1
-
-                # Check all other rooms at the same time
-                for k in range(len(matrix[i])):
-                    if k != j:
-                        next_field = matrix[i][k]
-                        if next_field is not None:
-                            allocation2 = data.class_allocations[next_field]
-
-                            # Calculate cost for teachers
-                            if allocation1.teacher.id == allocation2.teacher.id:
-                                overlaps += 1
-
-                            # Calculate cost for class groups
-                            if allocation1.class_group.id == allocation2.class_group.id:
-                                overlaps += 1
-
-    return overlaps
\ No newline at end of file
+    The kernels are declared with explicit signatures, so they compile (or load
+    from the on-disk cache) at import; this call makes sure that cost is paid at
+    startup rather than by the first optimize_timetable request. Optimizer
+    workers use app.services.optimizer.warmup, which also covers the spot
+    search kernels.
+    """
+    matrix = np.full((12, 1), -1, dtype=np.int32)
+    matrix[0, 0] = 0
+    ids = np.zeros(1, dtype=np.int32)
+    room_ok = np.ones((1, 1), dtype=np.bool_)
+    row_ok = np.ones((1, 12), dtype=np.bool_)
+    _overlaps_kernel(matrix, ids, ids, room_ok, row_ok, -1)
+    _hard_costs_rows_kernel(matrix, np.zeros(1, dtype=np.int64), ids, ids, room_ok, row_ok,
+                            np.zeros((12, 1), dtype=np.int64), np.zeros((12, 4), dtype=np.int64))
+    _empty_space_kernel(np.array([0, 2, 3], dtype=np.int32), np.array([0, 3], dtype=np.int64),
+                        np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64))
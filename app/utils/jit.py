@@ -0,0 +1,27 @@
+"""
+Optional Numba support for the numeric kernels.
+
+When numba is installed, ``njit`` compiles the decorated function to machine
+code. Without it, ``njit`` is a no-op decorator and the kernels run as plain
+Python, so development installs keep working.
+"""
+try:
+    from numba import njit, prange, set_num_threads
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def set_num_threads(n):
+        """Fallback for numba.set_num_threads; plain Python kernels are serial"""
+
+    def njit(*args, **kwargs):
+        """Fallback for numba.njit that returns the function unchanged"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+
+        return decorator
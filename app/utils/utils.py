@@ -1,6 +1,7 @@
 import json
 import random
-from typing import Dict, List, Tuple
+import numpy as np
+from typing import Dict, Optional, Tuple
 from app.models.timetable_data import TimetableData
 from app.models.class_allocation import ClassAllocation
 from app.utils.costs import (
@@ -11,47 +12,52 @@ from app.utils.costs import (
 
 
 def load_data_from_database(timetable_data: TimetableData, 
-                           teachers_empty_space: Dict[int, List[int]], 
-                           groups_empty_space: Dict[int, List[int]]) -> TimetableData:
+                           teachers_empty_space: Dict[int, np.ndarray], 
+                           groups_empty_space: Dict[int, np.ndarray],
+                           num_of_time_slots: int = 60) -> TimetableData:
     """
     Processes database data and initializes auxiliary structures.
     
+    Every teacher and class group gets an empty-space histogram, a row of one
+    shared int32 arena with [time] = number of classes at that matrix row.
+    
     Args:
         timetable_data: Timetable data from database (TimetableData)
-        teachers_empty_space: Empty spaces by teacher {teacher_id: [times]}
-        groups_empty_space: Empty spaces by class group {class_group_id: [times]}
+        teachers_empty_space: Empty spaces by teacher {teacher_id: [time] = classes}
+        groups_empty_space: Empty spaces by class group {class_group_id: [time] = classes}
+        num_of_time_slots: Number of time slots (matrix rows). Default: 60
         
     Returns:
         Processed and initialized TimetableData
     """
     # Initialize auxiliary structures for teachers
-    for teacher_id in timetable_data.teachers.keys():
-        if teacher_id not in teachers_empty_space:
-            teachers_empty_space[teacher_id] = []
+    _init_empty_space(teachers_empty_space, timetable_data.teachers.keys(), num_of_time_slots)
 
     # Initialize auxiliary structures for class groups
-    for class_group_id in timetable_data.class_groups.keys():
-        if class_group_id not in groups_empty_space:
-            groups_empty_space[class_group_id] = []
-
-    # For each allocation, determine possible classrooms based on space_type
-    for allocation_idx, allocation in timetable_data.class_allocations.items():
-        required_space_type_id = allocation.subject.required_space_type.id
-        
-        # Find classrooms compatible with the required space_type
-        possible_classroom_ids = []
-        for classroom_idx, classroom in timetable_data.classrooms.items():
-            if classroom.space_type.id == required_space_type_id and not classroom.blocked:
-                possible_classroom_ids.append(classroom_idx)
-        
-        allocation.possible_classrooms = possible_classroom_ids
+    _init_empty_space(groups_empty_space, timetable_data.class_groups.keys(), num_of_time_slots)
 
     return timetable_data
 
 
-def set_up(num_of_classrooms: int, num_of_time_slots: int = 60) -> Tuple[List[List], List[Tuple[int, int]]]:
+def _init_empty_space(empty_space: Dict[int, np.ndarray], owner_ids, num_of_time_slots: int):
+    """
+    Adds a zeroed histogram for every owner that has none yet, as views of one
+    contiguous arena.
+    
+    Args:
+        empty_space: Empty spaces by owner {owner_id: [time] = classes}
+        owner_ids: IDs of the teachers or class groups
+        num_of_time_slots: Number of time slots (histogram length)
+    """
+    missing = [owner_id for owner_id in owner_ids if owner_id not in empty_space]
+    arena = np.zeros((len(missing), num_of_time_slots), dtype=np.int32)
+    for owner_id, times in zip(missing, arena):
+        empty_space[owner_id] = times
+
+
+def set_up(num_of_classrooms: int, num_of_time_slots: int = 60) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Sets up the timetable matrix and the list of free slots.
+    Sets up the timetable matrix and the mask of free slots.
     
     Args:
         num_of_classrooms: Number of classrooms (columns)
@@ -59,59 +65,62 @@ def set_up(num_of_classrooms: int, num_of_time_slots: int = 60) -> Tuple[List[Li
                           Default: 60 = 5 days * 12 hours per day
         
     Returns:
-        matrix: Matrix [time][room] = allocation_index or None
-        free: List of tuples (time, room) representing free slots
+        matrix: int32 matrix [time][room] = allocation_index, -1 for free slots
+        free: Boolean mask [time][room], True where the slot is free
     """
     width, height = num_of_classrooms, num_of_time_slots
-    matrix = [[None for x in range(width)] for y in range(height)]
-    free = []
+    matrix = np.full((height, width), -1, dtype=np.int32)
 
-    # initialise free dict as all the fields from matrix
-    for i in range(len(matrix)):
-        for j in range(len(matrix[i])):
-            free.append((i, j))
+    # initialise free mask as all the fields from matrix
+    free = np.ones((height, width), dtype=np.bool_)
     
     return matrix, free
 
 
-def show_timetable(matrix: List[List]):
+def show_timetable(matrix: np.ndarray):
     """
     Displays the timetable matrix.
     
     Args:
-        matrix: Timetable matrix [time][room] = allocation_index
+        matrix: Timetable matrix [time][room] = allocation_index, -1 for free slots
     """
     days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
     hours = [7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18]  # Typical university hours
 
-    # print heading for classrooms
+    # Build the whole table first and print it at once, rather than one
+    # print call per cell
+    lines = []
+
+    # heading for classrooms
+    heading = []
     for i in range(len(matrix[0])):
         if i == 0:
-            print('{:17s} S{:6s}'.format('', '0'), end='')
+            heading.append('{:17s} S{:6s}'.format('', '0'))
         else:
-            print('S{:6s}'.format(str(i)), end='')
-    print()
+            heading.append('S{:6s}'.format(str(i)))
+    lines.append(''.join(heading))
 
     day_cnt = 0
     hour_cnt = 0
-    for i in range(len(matrix)):
+    for row in np.asarray(matrix).tolist():
         if hour_cnt < len(hours):
             day = days[day_cnt] if day_cnt < len(days) else f'Dia {day_cnt}'
             hour = hours[hour_cnt]
-            print('{:10s} {:2d}h ->  '.format(day, hour), end='')
-            for j in range(len(matrix[i])):
-                print('{:6s} '.format(str(matrix[i][j]) if matrix[i][j] is not None else '-'), end='')
-            print()
+            cells = ''.join('{:6s} '.format(str(field) if field >= 0 else '-') for field in row)
+            lines.append('{:10s} {:2d}h ->  '.format(day, hour) + cells)
         
         hour_cnt += 1
         if hour_cnt >= 12:  # 12 slots por dia
             hour_cnt = 0
             day_cnt += 1
-            print()
+            lines.append('')
+
+    print('\n'.join(lines))
 
-def show_statistics(matrix: List[List], data: TimetableData, 
-                   groups_empty_space: Dict[int, List[int]], 
-                   teachers_empty_space: Dict[int, List[int]]):
+def show_statistics(matrix: np.ndarray, data: TimetableData, 
+                   groups_empty_space: Dict[int, np.ndarray], 
+                   teachers_empty_space: Dict[int, np.ndarray],
+                   max_overlaps: Optional[int] = None):
     """
     Displays statistics about the generated timetable.
     
@@ -120,10 +129,14 @@ def show_statistics(matrix: List[List], data: TimetableData,
         data: Timetable data
         groups_empty_space: Empty spaces by class group
         teachers_empty_space: Empty spaces by teacher
+        max_overlaps: Optional bound for the hard constraint check; a cost above
+                      it is only reported as such
     """
-    cost_hard = check_hard_constraints(matrix, data)
+    cost_hard = check_hard_constraints(matrix, data, max_overlaps=max_overlaps)
     if cost_hard == 0:
         print('✓ Hard constraints satisfied: 100.00%')
+    elif max_overlaps is not None and cost_hard > max_overlaps:
+        print(f'✗ Hard constraints NOT satisfied, cost: > {max_overlaps}')
     else:
         print(f'✗ Hard constraints NOT satisfied, cost: {cost_hard}')
 
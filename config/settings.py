@@ -1,9 +1,15 @@
 import os
+from functools import lru_cache
 from typing import Dict, Any
 
 
+# Both configs are read once per process; restart the process to pick up
+# changed environment variables
+
+
+@lru_cache(maxsize=1)
 def get_rabbitmq_config() -> Dict[str, Any]:
-    """Get RabbitMQ configuration from environment variables"""
+    """Get RabbitMQ configuration from environment variables (cached)"""
     return {
         "host": os.getenv("RABBITMQ_HOST", "localhost"),
         "port": int(os.getenv("RABBITMQ_PORT", 5672)),
@@ -14,12 +20,16 @@ def get_rabbitmq_config() -> Dict[str, Any]:
         "heartbeat": int(os.getenv("RABBITMQ_HEARTBEAT", 600)),
         "connection_attempts": int(os.getenv("RABBITMQ_CONNECTION_ATTEMPTS", 3)),
         "retry_delay": int(os.getenv("RABBITMQ_RETRY_DELAY", 5)),
+        "prefetch_count": int(os.getenv("RABBITMQ_PREFETCH_COUNT", 100)),
+        "ack_batch_size": int(os.getenv("RABBITMQ_ACK_BATCH_SIZE", 10)),
     }
 
 
+@lru_cache(maxsize=1)
 def get_app_config() -> Dict[str, Any]:
-    """Get application configuration from environment variables"""
+    """Get application configuration from environment variables (cached)"""
     return {
         "debug": os.getenv("DEBUG", "False").lower() == "true",
         "log_level": os.getenv("LOG_LEVEL", "INFO"),
+        "optimizer_max_workers": int(os.getenv("OPTIMIZER_MAX_WORKERS", os.cpu_count() or 1)),
     }